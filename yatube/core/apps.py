@@ -1,5 +1,10 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import ratelimit
+        checks.register(ratelimit.check_shared_cache, checks.Tags.caches)
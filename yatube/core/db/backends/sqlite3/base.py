@@ -0,0 +1,10 @@
+from django.db.backends.sqlite3 import base
+
+from core.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    @staticmethod
+    def reset_autocommit(connection, autocommit):
+        # Так же, как base.DatabaseWrapper._set_autocommit.
+        connection.isolation_level = None if autocommit else ''
@@ -0,0 +1,249 @@
+"""Пул соединений с БД внутри процесса.
+
+Движки core.db.backends.* берут соединения из пула вместо нового
+подключения на каждый запрос и возвращают их в close(). Настройки пула
+лежат в ключе POOL описания базы:
+
+    ENABLED       - выключенный пул ведёт себя как обычный движок;
+    MIN_SIZE      - сколько соединений открыть заранее;
+    MAX_SIZE      - больше соединений не открывается, запросы ждут;
+    TIMEOUT       - сколько секунд ждать свободного соединения;
+    MAX_LIFETIME  - соединения старше пересоздаются;
+    PRE_PING      - проверять соединение SELECT 1 перед выдачей.
+
+Проверка, открытие и откат соединения идут без блокировки пула: медленная
+или зависшая сеть задерживает только свой поток. При возврате в пул
+транзакция откатывается, а режим autocommit сбрасывается на тот, что
+задан в настройках базы.
+
+Время ожидания соединения копится в метриках потока, их читает
+профилировщик запросов (core/profiling.py).
+"""
+import threading
+import time
+from collections import Counter, deque
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MIN_SIZE': 1,
+    'MAX_SIZE': 10,
+    'TIMEOUT': 5,
+    'MAX_LIFETIME': 30 * 60,
+    'PRE_PING': True,
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+_metrics = threading.local()
+
+
+def pool_options(settings_dict):
+    return {**DEFAULTS, **(settings_dict.get('POOL') or {})}
+
+
+class ConnectionPool:
+    def __init__(self, connect, error_class, min_size, max_size, timeout,
+                 max_lifetime, pre_ping, reset=None):
+        self.connect = connect
+        self.reset = reset
+        self.error_class = error_class
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.pre_ping = pre_ping
+        self.stats = Counter()
+        self._idle = deque()
+        self._created = {}
+        # Места, занятые под соединения, которые открываются прямо сейчас.
+        self._opening = 0
+        self._condition = threading.Condition()
+
+    @property
+    def size(self):
+        return len(self._created) + self._opening
+
+    def _open(self):
+        """Открывает соединение на месте, занятом под блокировкой."""
+        try:
+            connection = self.connect()
+        except Exception:
+            with self._condition:
+                self._opening -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._opening -= 1
+            self._created[id(connection)] = time.monotonic()
+            self.stats['created'] += 1
+        return connection
+
+    def _discard(self, connection):
+        self._created.pop(id(connection), None)
+        try:
+            connection.close()
+        except Exception:
+            pass
+        self._condition.notify()
+
+    def _expired(self, connection):
+        created = self._created.get(id(connection), 0)
+        return time.monotonic() - created > self.max_lifetime
+
+    def _is_alive(self, connection):
+        try:
+            cursor = connection.cursor()
+            cursor.execute('SELECT 1')
+            cursor.close()
+            # Без autocommit SELECT открывает транзакцию, а внутри неё
+            # Django не сможет переключить режим соединения.
+            connection.rollback()
+        except Exception:
+            return False
+        return True
+
+    def fill(self):
+        while True:
+            with self._condition:
+                if self.size >= self.min_size:
+                    return
+                self._opening += 1
+            connection = self._open()
+            with self._condition:
+                self._idle.append(connection)
+                self._condition.notify()
+
+    def checkout(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            connection = self._take(deadline)
+            if connection is None:
+                connection = self._open()
+            elif self.pre_ping and not self._is_alive(connection):
+                with self._condition:
+                    self.stats['failed_pings'] += 1
+                    self._discard(connection)
+                continue
+            return self._checked_out(connection, started)
+
+    def _take(self, deadline):
+        """Свободное соединение или None, если занято место под новое."""
+        with self._condition:
+            while True:
+                while self._idle:
+                    connection = self._idle.popleft()
+                    if not self._expired(connection):
+                        return connection
+                    self.stats['recycled'] += 1
+                    self._discard(connection)
+                if self.size < self.max_size:
+                    self._opening += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    raise self.error_class(
+                        f'Нет свободного соединения в пуле за '
+                        f'{self.timeout} с'
+                    )
+                self._condition.wait(remaining)
+
+    def _checked_out(self, connection, started):
+        waited = time.monotonic() - started
+        with self._condition:
+            self.stats['checkouts'] += 1
+        _metrics.checkouts = getattr(_metrics, 'checkouts', 0) + 1
+        _metrics.wait_seconds = getattr(_metrics, 'wait_seconds', 0) + waited
+        return connection
+
+    def checkin(self, connection):
+        try:
+            # Незавершённая транзакция и режим autocommit прошлого
+            # владельца не должны достаться следующему.
+            connection.rollback()
+            if self.reset is not None:
+                self.reset(connection)
+        except Exception:
+            with self._condition:
+                self.stats['broken'] += 1
+                self._discard(connection)
+            return
+        with self._condition:
+            if self._expired(connection):
+                self.stats['recycled'] += 1
+                self._discard(connection)
+                return
+            self._idle.append(connection)
+            self._condition.notify()
+
+    def describe(self):
+        with self._condition:
+            return {'size': self.size, 'idle': len(self._idle),
+                    **self.stats}
+
+
+def get_pool(key, connect, error_class, options, reset=None):
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(
+                connect, error_class,
+                min_size=options['MIN_SIZE'],
+                max_size=options['MAX_SIZE'],
+                timeout=options['TIMEOUT'],
+                max_lifetime=options['MAX_LIFETIME'],
+                pre_ping=options['PRE_PING'],
+                reset=reset,
+            )
+    return pool
+
+
+def pools():
+    with _pools_lock:
+        return {key[0]: pool.describe() for key, pool in _pools.items()}
+
+
+def reset_checkout_metrics():
+    _metrics.checkouts = 0
+    _metrics.wait_seconds = 0.0
+
+
+def checkout_metrics():
+    return (getattr(_metrics, 'checkouts', 0),
+            getattr(_metrics, 'wait_seconds', 0.0))
+
+
+class PooledDatabaseWrapperMixin:
+    """Примесь к DatabaseWrapper движка: соединения берутся из пула.
+
+    Движок задаёт reset_autocommit(connection, autocommit) для сырого
+    соединения своего драйвера.
+    """
+
+    def get_pool(self, conn_params):
+        key = (self.alias, repr(sorted(conn_params.items())))
+        return get_pool(
+            key,
+            lambda: super(PooledDatabaseWrapperMixin, self)
+            .get_new_connection(conn_params),
+            self.Database.OperationalError,
+            pool_options(self.settings_dict),
+            reset=lambda connection: self.reset_autocommit(
+                connection, self.settings_dict['AUTOCOMMIT']
+            ),
+        )
+
+    def get_new_connection(self, conn_params):
+        if not pool_options(self.settings_dict)['ENABLED']:
+            self.pool = None
+            return super().get_new_connection(conn_params)
+        self.pool = self.get_pool(conn_params)
+        self.pool.fill()
+        return self.pool.checkout()
+
+    def _close(self):
+        pool = getattr(self, 'pool', None)
+        if pool is None or self.connection is None:
+            return super()._close()
+        pool.checkin(self.connection)
@@ -2,12 +2,16 @@ from django.db import models
 
 
 class CreatedModel(models.Model):
-    """Абстрактная модель, добавляет дату создания."""
+    """Абстрактная модель, добавляет даты создания и изменения."""
     pub_date = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True,
         db_index=True,
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+    )
 
     class Meta:
         abstract = True
@@ -0,0 +1,157 @@
+import base64
+import binascii
+
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+def cursor_key(obj):
+    """Ключ (pub_date, id) объекта модели или словаря из .values()."""
+    if isinstance(obj, dict):
+        return obj['pub_date'], obj['id']
+    return obj.pub_date, obj.pk
+
+
+def encode_cursor(direction, obj):
+    """Упаковывает направление и ключ (pub_date, id) в строку для URL."""
+    pub_date, pk = cursor_key(obj)
+    raw = f'{direction}|{pub_date.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор, созданный encode_cursor."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, pub_date, pk = raw.split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor('Некорректный курсор')
+    if direction not in (NEXT, PREVIOUS) or pub_date is None:
+        raise InvalidCursor('Некорректный курсор')
+    return direction, pub_date, pk
+
+
+class CountedPaginator(Paginator):
+    """Paginator, берущий число объектов из count_func вместо COUNT(*).
+
+    count_func может читать счётчик, кэш или оценку планировщика; окно
+    номеров страниц для шаблона строит get_elided_page_range().
+    """
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, count_func=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_func = count_func
+
+    @cached_property
+    def count(self):
+        if self.count_func is None:
+            return super().count
+        return self.count_func()
+
+    def page(self, number):
+        # Тип страницы остаётся Page: окно номеров - просто атрибут.
+        page = super().page(number)
+        page.elided_page_range = list(
+            self.get_elided_page_range(page.number)
+        )
+        return page
+
+    def get_elided_page_range(self, number=1, on_each_side=2, on_ends=1):
+        """Номера страниц вокруг текущей и по краям, пропуски - ELLIPSIS."""
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > on_each_side + on_ends + 2:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < self.num_pages - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1, self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+
+class CursorPage(Page):
+    """Страница, которая знает соседей только по курсорам, без COUNT."""
+    is_cursor = True
+
+    def __init__(self, object_list, cursor, paginator,
+                 has_next, has_previous):
+        super().__init__(object_list, cursor, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<Page {self.number or "first"}>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next or not self.object_list:
+            return None
+        return encode_cursor(NEXT, self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous or not self.object_list:
+            return None
+        return encode_cursor(PREVIOUS, self.object_list[0])
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по ключу (pub_date, id) от новых к старым.
+
+    Любая страница отдаётся одним запросом по диапазону индекса,
+    без COUNT(*) и OFFSET.
+    """
+
+    def page(self, cursor=None):
+        queryset = self.object_list
+        if not cursor:
+            direction, key = NEXT, None
+        else:
+            direction, pub_date, pk = decode_cursor(cursor)
+            key = (pub_date, pk)
+        if direction == NEXT:
+            if key is not None:
+                queryset = queryset.filter(
+                    Q(pub_date__lt=key[0])
+                    | Q(pub_date=key[0], pk__lt=key[1])
+                )
+            queryset = queryset.order_by('-pub_date', '-pk')
+        else:
+            queryset = queryset.filter(
+                Q(pub_date__gt=key[0]) | Q(pub_date=key[0], pk__gt=key[1])
+            ).order_by('pub_date', 'pk')
+        items = list(queryset[:self.per_page + 1])
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if direction == NEXT:
+            return CursorPage(items, cursor, self,
+                              has_next=has_more, has_previous=key is not None)
+        items.reverse()
+        return CursorPage(items, cursor, self,
+                          has_next=True, has_previous=has_more)
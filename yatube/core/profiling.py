@@ -0,0 +1,222 @@
+"""Выборочное профилирование запросов.
+
+ProfilingMiddleware профилирует долю PROFILING_SAMPLE_RATE запросов:
+число и время SQL-запросов, повторы одного и того же запроса (признак
+N+1), время рендера каждого шаблона, включая includes/post.html,
+попадания в кэш и ожидание соединения из пула. Сэмплы складываются
+в кольцевой буфер процесса, а summary() сводит их по имени маршрута
+для страницы профилирования.
+Запрос вне выборки стоит одного вызова random().
+"""
+import random
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.db import connections
+from django.template.base import Template
+
+from .db import pool
+
+_local = threading.local()
+_lock = threading.Lock()
+_samples = deque(maxlen=settings.PROFILING_BUFFER_SIZE)
+_MISS = object()
+
+
+class RequestProfile:
+    """Метрики одного запроса; заодно обёртка для execute_wrapper."""
+
+    def __init__(self):
+        self.queries = Counter()
+        self.sql_seconds = 0.0
+        self.templates = defaultdict(float)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.pool_checkouts = 0
+        self.pool_wait_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_seconds += time.perf_counter() - started
+            self.queries[sql] += 1
+
+
+def _install_template_hook():
+    """Оборачивает Template._render, как это делают тестовые утилиты."""
+    render = Template._render
+    if getattr(render, 'profiled', False):
+        return
+
+    def profiled_render(self, context):
+        profile = getattr(_local, 'profile', None)
+        if profile is None:
+            return render(self, context)
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            name = self.origin.template_name or self.name or '<string>'
+            profile.templates[name] += time.perf_counter() - started
+
+    profiled_render.profiled = True
+    Template._render = profiled_render
+
+
+def _instrument_caches(profile):
+    """Считает попадания в кэши этого потока; возвращает откат."""
+    instrumented = []
+    for alias in settings.CACHES:
+        cache = caches[alias]
+        get = cache.get
+
+        def profiled_get(key, default=None, version=None, get=get):
+            value = get(key, _MISS, version)
+            if value is _MISS:
+                profile.cache_misses += 1
+                return default
+            profile.cache_hits += 1
+            return value
+
+        cache.get = profiled_get
+        # BaseCache.get_many сам вызывает get, иначе считаем отдельно.
+        if type(cache).get_many is not BaseCache.get_many:
+            get_many = cache.get_many
+
+            def profiled_get_many(keys, version=None, get_many=get_many):
+                keys = list(keys)
+                found = get_many(keys, version)
+                profile.cache_hits += len(found)
+                profile.cache_misses += len(keys) - len(found)
+                return found
+
+            cache.get_many = profiled_get_many
+        instrumented.append(cache)
+
+    def restore():
+        for cache in instrumented:
+            cache.__dict__.pop('get', None)
+            cache.__dict__.pop('get_many', None)
+    return restore
+
+
+def record(url_name, seconds, profile):
+    sample = {
+        'url_name': url_name,
+        'seconds': seconds,
+        'queries': sum(profile.queries.values()),
+        'sql_seconds': profile.sql_seconds,
+        'duplicates': {
+            sql: count for sql, count in profile.queries.items() if count > 1
+        },
+        'templates': dict(profile.templates),
+        'cache_hits': profile.cache_hits,
+        'cache_misses': profile.cache_misses,
+        'pool_checkouts': profile.pool_checkouts,
+        'pool_wait_seconds': profile.pool_wait_seconds,
+    }
+    with _lock:
+        _samples.append(sample)
+
+
+def clear():
+    with _lock:
+        _samples.clear()
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def summary(limit=5):
+    """Сводка сэмплов по маршрутам, самые затратные первыми."""
+    with _lock:
+        samples = list(_samples)
+    routes = {}
+    for sample in samples:
+        route = routes.setdefault(sample['url_name'], {
+            'url_name': sample['url_name'],
+            'requests': 0,
+            'seconds': 0.0,
+            'max_seconds': 0.0,
+            'queries': 0,
+            'sql_seconds': 0.0,
+            'duplicates': Counter(),
+            'templates': Counter(),
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'pool_checkouts': 0,
+            'pool_wait_seconds': 0.0,
+        })
+        route['requests'] += 1
+        route['seconds'] += sample['seconds']
+        route['max_seconds'] = max(route['max_seconds'], sample['seconds'])
+        route['queries'] += sample['queries']
+        route['sql_seconds'] += sample['sql_seconds']
+        route['duplicates'].update(sample['duplicates'])
+        route['templates'].update(sample['templates'])
+        route['cache_hits'] += sample['cache_hits']
+        route['cache_misses'] += sample['cache_misses']
+        route['pool_checkouts'] += sample['pool_checkouts']
+        route['pool_wait_seconds'] += sample['pool_wait_seconds']
+    result = []
+    for route in sorted(routes.values(), key=lambda r: -r['seconds']):
+        requests = route['requests']
+        lookups = route['cache_hits'] + route['cache_misses']
+        result.append({
+            'url_name': route['url_name'],
+            'requests': requests,
+            'avg_ms': _ms(route['seconds'] / requests),
+            'max_ms': _ms(route['max_seconds']),
+            'avg_queries': round(route['queries'] / requests, 1),
+            'avg_sql_ms': _ms(route['sql_seconds'] / requests),
+            'duplicates': route['duplicates'].most_common(limit),
+            'templates': [
+                (name, _ms(seconds / requests))
+                for name, seconds in route['templates'].most_common(limit)
+            ],
+            'cache_hits': route['cache_hits'],
+            'cache_misses': route['cache_misses'],
+            'cache_hit_ratio': (
+                round(route['cache_hits'] / lookups, 2) if lookups else None
+            ),
+            'avg_pool_checkouts': round(
+                route['pool_checkouts'] / requests, 1
+            ),
+            'avg_pool_wait_ms': _ms(route['pool_wait_seconds'] / requests),
+        })
+    return result
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _install_template_hook()
+
+    def __call__(self, request):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+        profile = RequestProfile()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            stack.callback(_instrument_caches(profile))
+            stack.callback(setattr, _local, 'profile', None)
+            _local.profile = profile
+            pool.reset_checkout_metrics()
+            response = self.get_response(request)
+        profile.pool_checkouts, profile.pool_wait_seconds = (
+            pool.checkout_metrics()
+        )
+        match = getattr(request, 'resolver_match', None)
+        record(match.view_name if match else None,
+               time.perf_counter() - started, profile)
+        return response
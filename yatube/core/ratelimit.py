@@ -0,0 +1,192 @@
+"""Ограничение частоты запросов корзиной токенов в общем кэше.
+
+Лимиты задаются в RATE_LIMITS по имени маршрута:
+
+    'posts:add_comment': {'rate': '20/m'},
+    'posts:profile_follow': {'rate': '60/m', 'methods': ('GET', 'POST')},
+
+rate - «N/s|m|h»: в корзине N токенов, и она пополняется на N за период;
+methods - какие методы ограничивать (по умолчанию POST). Корзина
+заводится на IP и, если в сессии есть пользователь, на пользователя.
+Проверка идёт в process_view до кода представления, так что отказ 429
+не делает ни одного запроса к моделям; корзина IP проверяется раньше
+чтения сессии.
+
+Состояние корзины - один счётчик в кэше RATE_LIMIT_CACHE, меняется
+только атомарными add/incr/decr: это «теоретическое время прибытия»
+GCRA в тиках, где тик - доля токена. Бэкенд должен делать incr атомарно
+и не сбрасывать срок жизни ключа (Memcached, Redis, LocMemCache);
+с другим middleware не запустится. LocMemCache держит корзины в каждом
+процессе отдельно, поэтому без DEBUG проверка core.W001 требует общий
+Memcached или Redis. Запрос проходит, если
+счётчик после incr не ушёл дальше текущего времени больше чем на
+ёмкость корзины; отклонённый запрос возвращает свой токен.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core import checks
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+
+TICKS_PER_TOKEN = 1000
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60}
+DEFAULT_METHODS = ('POST',)
+BUCKET_KEY = 'ratelimit:{}:{}'
+REJECTED_KEY = 'ratelimit:rejected:{}'
+# Ключ корзины живёт в несколько раз дольше её полного пополнения: после
+# такого простоя корзина всё равно была бы полной.
+BUCKET_TIMEOUT_FILLS = 10
+# У файлового и БД-кэша incr - это get и set: параллельные запросы
+# теряют токены, а set сбрасывает срок жизни ключа.
+ATOMIC_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.memcached.MemcachedCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+    'django_redis.cache.RedisCache',
+)
+# Эти бэкенды хранят ключи в памяти процесса: лимит умножается на число
+# воркеров.
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+
+def get_cache():
+    return caches[settings.RATE_LIMIT_CACHE]
+
+
+def check_cache_backend():
+    backend = settings.CACHES[settings.RATE_LIMIT_CACHE]['BACKEND']
+    if backend not in ATOMIC_BACKENDS:
+        raise ImproperlyConfigured(
+            f'CACHES[{settings.RATE_LIMIT_CACHE!r}] использует {backend}: '
+            f'для ограничения частоты нужен бэкенд с атомарным incr '
+            f'({", ".join(ATOMIC_BACKENDS)})'
+        )
+
+
+def check_shared_cache(app_configs, **kwargs):
+    backend = settings.CACHES[settings.RATE_LIMIT_CACHE]['BACKEND']
+    if settings.DEBUG or backend not in PROCESS_LOCAL_BACKENDS:
+        return []
+    return [checks.Warning(
+        f'Корзины лимитов хранятся в {backend}: у каждого процесса свои '
+        f'счётчики, и лимит умножается на число воркеров',
+        hint='Задайте общий Memcached или Redis в RATE_LIMIT_CACHE_BACKEND '
+             'и RATE_LIMIT_CACHE_LOCATION',
+        id='core.W001',
+    )]
+
+
+def parse_rate(rate):
+    """'20/m' -> (ёмкость в токенах, токенов в секунду)."""
+    count, period = rate.split('/')
+    count = int(count)
+    return count, count / PERIODS[period]
+
+
+class TokenBucket:
+    def __init__(self, key, rate):
+        self.key = key
+        self.capacity, self.per_second = parse_rate(rate)
+        self.timeout = math.ceil(
+            self.capacity / self.per_second * BUCKET_TIMEOUT_FILLS
+        )
+
+    def now_ticks(self):
+        return int(time.time() * self.per_second * TICKS_PER_TOKEN)
+
+    def take(self):
+        """Берёт токен; возвращает 0 или сколько секунд ждать."""
+        now = self.now_ticks()
+        cache = get_cache()
+        try:
+            value = cache.incr(self.key, TICKS_PER_TOKEN)
+        except ValueError:
+            # Новая корзина полна: после первого запроса в ней N-1 токен.
+            if cache.add(self.key, now + TICKS_PER_TOKEN, self.timeout):
+                return 0
+            value = cache.incr(self.key, TICKS_PER_TOKEN)
+        if value - TICKS_PER_TOKEN < now:
+            # Корзина простаивала: токены сверх ёмкости не копятся.
+            cache.incr(self.key, now - (value - TICKS_PER_TOKEN))
+            return 0
+        excess = value - now - self.capacity * TICKS_PER_TOKEN
+        if excess <= 0:
+            return 0
+        self.give_back()
+        return math.ceil(excess / TICKS_PER_TOKEN / self.per_second)
+
+    def give_back(self):
+        try:
+            get_cache().decr(self.key, TICKS_PER_TOKEN)
+        except ValueError:
+            pass
+
+
+def client_ip(request):
+    return request.META.get(settings.RATE_LIMIT_IP_META_KEY, '')
+
+
+def rejected_counts():
+    """Сколько запросов отклонено по каждому маршруту из RATE_LIMITS."""
+    keys = {REJECTED_KEY.format(name): name for name in settings.RATE_LIMITS}
+    found = get_cache().get_many(keys)
+    return {name: found.get(key, 0) for key, name in keys.items()}
+
+
+def count_rejected(url_name):
+    key = REJECTED_KEY.format(url_name)
+    cache = get_cache()
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, timeout=None)
+
+
+class RateLimitMiddleware:
+    def __init__(self, get_response):
+        check_cache_backend()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def buckets(self, request, url_name, rate):
+        yield TokenBucket(
+            BUCKET_KEY.format(url_name, f'ip:{client_ip(request)}'), rate
+        )
+        user_id = request.session.get(SESSION_KEY)
+        if user_id is not None:
+            yield TokenBucket(
+                BUCKET_KEY.format(url_name, f'user:{user_id}'), rate
+            )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        url_name = request.resolver_match.view_name
+        limit = settings.RATE_LIMITS.get(url_name)
+        if limit is None:
+            return None
+        if request.method not in limit.get('methods', DEFAULT_METHODS):
+            return None
+        taken = []
+        for bucket in self.buckets(request, url_name, limit['rate']):
+            retry_after = bucket.take()
+            if retry_after:
+                for previous in taken:
+                    previous.give_back()
+                count_rejected(url_name)
+                response = HttpResponse(
+                    'Слишком много запросов, попробуйте позже.',
+                    content_type='text/plain; charset=utf-8',
+                    status=429,
+                )
+                response['Retry-After'] = str(retry_after)
+                return response
+            taken.append(bucket)
+        return None
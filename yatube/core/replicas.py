@@ -0,0 +1,79 @@
+"""Чтение с реплик и запись в основную БД.
+
+Роутер отправляет чтения на реплики DATABASE_REPLICAS только внутри
+безопасных (GET, HEAD) запросов, которые ещё ничего не записали; всё
+остальное - команды, фоновые потоки, POST - работает с default.
+После записи пользователь на DATABASE_STICKY_SECONDS получает куку, и
+его чтения идут в основную БД, пока реплики догоняют её.
+"""
+import random
+import threading
+import time
+
+from django.conf import settings
+
+PRIMARY = 'default'
+STICKY_COOKIE = 'db_primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = threading.local()
+
+
+def use_replicas(enabled):
+    _state.use_replicas = enabled
+    _state.wrote = False
+
+
+def replicas_enabled():
+    return getattr(_state, 'use_replicas', False)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or not replicas_enabled():
+            return PRIMARY
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if replicas_enabled():
+            # Дальше в этом запросе читаем свои же записи из default.
+            _state.use_replicas = False
+            _state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему репликацией.
+        return db == PRIMARY
+
+
+class ReplicaStickinessMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def is_sticky(self, request):
+        try:
+            until = float(request.COOKIES.get(STICKY_COOKIE, 0))
+        except ValueError:
+            return False
+        return until > time.time()
+
+    def __call__(self, request):
+        use_replicas(
+            request.method in SAFE_METHODS and not self.is_sticky(request)
+        )
+        try:
+            response = self.get_response(request)
+            wrote = _state.wrote or request.method not in SAFE_METHODS
+        finally:
+            use_replicas(False)
+        if wrote:
+            seconds = settings.DATABASE_STICKY_SECONDS
+            response.set_cookie(
+                STICKY_COOKIE, str(time.time() + seconds),
+                max_age=seconds, httponly=True,
+            )
+        return response
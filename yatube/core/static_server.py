@@ -0,0 +1,132 @@
+"""Раздача собранной статики прямо из WSGI, для установок без nginx.
+
+Таблица файлов STATIC_ROOT строится один раз при старте: на запрос
+остаётся найти файл в словаре и выбрать готовую .br или .gz копию по
+Accept-Encoding, ничего не сжимая. Файлы с хешем из манифеста
+collectstatic кэшируются браузером на год, остальные - ненадолго.
+"""
+import json
+import mimetypes
+import os
+from email.utils import formatdate
+from wsgiref.util import FileWrapper
+
+from django.conf import settings
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age=60'
+# Порядок предпочтения кодировок и суффиксы их копий.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+MANIFEST_NAME = 'staticfiles.json'
+
+
+class StaticFile:
+    def __init__(self, path, immutable):
+        self.content_type = (
+            mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        )
+        self.cache_control = (
+            IMMUTABLE_CACHE_CONTROL if immutable else DEFAULT_CACHE_CONTROL
+        )
+        stat = os.stat(path)
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+        tag = f'{int(stat.st_mtime)}-{stat.st_size}'
+        # Копии отличаются байтами, поэтому у каждой свой ETag.
+        self.variants = {None: (path, stat.st_size, f'"{tag}"')}
+        for encoding, suffix in ENCODINGS:
+            if os.path.isfile(path + suffix):
+                self.variants[encoding] = (
+                    path + suffix, os.path.getsize(path + suffix),
+                    f'"{tag}-{encoding}"',
+                )
+
+    def choose(self, accept_encoding):
+        accepted = parse_accept_encoding(accept_encoding)
+        for encoding, _ in ENCODINGS:
+            quality = accepted.get(encoding, accepted.get('*', 0))
+            if quality > 0 and encoding in self.variants:
+                return encoding, self.variants[encoding]
+        return None, self.variants[None]
+
+
+def parse_accept_encoding(header):
+    """Словарь «кодировка -> q»; q=0 означает, что кодировка запрещена."""
+    accepted = {}
+    for part in header.split(','):
+        name, *params = (item.strip() for item in part.split(';'))
+        if not name:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name.lower()] = quality
+    return accepted
+
+
+def scan(root):
+    """Словарь «путь относительно root -> StaticFile»."""
+    immutable = set()
+    try:
+        with open(os.path.join(root, MANIFEST_NAME)) as manifest:
+            immutable.update(json.load(manifest).get('paths', {}).values())
+    except (OSError, ValueError):
+        pass
+    compressed = tuple(suffix for _, suffix in ENCODINGS)
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if name.endswith(compressed) or name == MANIFEST_NAME:
+                continue
+            path = os.path.join(directory, name)
+            relative = os.path.relpath(path, root).replace(os.sep, '/')
+            files[relative] = StaticFile(path, relative in immutable)
+    return files
+
+
+class StaticFilesApplication:
+    """WSGI-обёртка: статику отдаёт сама, остальное - приложению."""
+
+    def __init__(self, application, root=None, prefix=None):
+        self.application = application
+        self.prefix = prefix or settings.STATIC_URL
+        self.files = scan(root or settings.STATIC_ROOT)
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if not path.startswith(self.prefix):
+            return self.application(environ, start_response)
+        static_file = self.files.get(path[len(self.prefix):])
+        if static_file is None:
+            return self.application(environ, start_response)
+        method = environ['REQUEST_METHOD']
+        if method not in ('GET', 'HEAD'):
+            start_response('405 Method Not Allowed', [('Allow', 'GET, HEAD')])
+            return [b'']
+        encoding, (file_path, size, etag) = static_file.choose(
+            environ.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        headers = [
+            ('Cache-Control', static_file.cache_control),
+            ('ETag', etag),
+            ('Last-Modified', static_file.last_modified),
+            ('Vary', 'Accept-Encoding'),
+        ]
+        if environ.get('HTTP_IF_NONE_MATCH') == etag:
+            start_response('304 Not Modified', headers)
+            return [b'']
+        headers += [
+            ('Content-Type', static_file.content_type),
+            ('Content-Length', str(size)),
+        ]
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        start_response('200 OK', headers)
+        if method == 'HEAD':
+            return [b'']
+        file_wrapper = environ.get('wsgi.file_wrapper', FileWrapper)
+        return file_wrapper(open(file_path, 'rb'))
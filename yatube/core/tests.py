@@ -1,9 +1,568 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from unittest import mock
+from wsgiref.util import setup_testing_defaults
+
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core import checks
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
 from http import HTTPStatus
 
+from posts.models import Group, Post
+
+from . import profiling, ratelimit, replicas
+from .db.backends.sqlite3.base import DatabaseWrapper as SQLiteWrapper
+from .db.pool import ConnectionPool
+from .pagination import CountedPaginator
+from .static_server import IMMUTABLE_CACHE_CONTROL, StaticFilesApplication
+
+User = get_user_model()
+
 
 class ViewTestClass(TestCase):
     def test_error_page(self):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class CountedPaginatorTest(TestCase):
+    def test_count_comes_from_count_func(self):
+        paginator = CountedPaginator(range(5), 2, count_func=lambda: 100)
+        self.assertEqual(paginator.count, 100)
+        self.assertEqual(paginator.num_pages, 50)
+
+    def test_elided_page_range(self):
+        """Окно страниц не разворачивается во все номера."""
+        paginator = CountedPaginator(range(1000), 10)
+        ellipsis = CountedPaginator.ELLIPSIS
+        cases = (
+            (1, [1, 2, 3, ellipsis, 100]),
+            (50, [1, ellipsis, 48, 49, 50, 51, 52, ellipsis, 100]),
+            (100, [1, ellipsis, 98, 99, 100]),
+        )
+        for number, expected in cases:
+            with self.subTest(number=number):
+                self.assertEqual(
+                    paginator.page(number).elided_page_range, expected
+                )
+        short = CountedPaginator(range(30), 10)
+        self.assertEqual(list(short.get_elided_page_range(2)), [1, 2, 3])
+
+
+@override_settings(PROFILING_SAMPLE_RATE=1)
+class ProfilingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        profiling.clear()
+
+    def test_sampled_request_is_recorded(self):
+        """Сэмпл содержит SQL, шаблоны и обращения к кэшу по маршруту."""
+        self.client.get(reverse('posts:index_page'))
+        route, = profiling.summary()
+        self.assertEqual(route['url_name'], 'posts:index_page')
+        self.assertEqual(route['requests'], 1)
+        self.assertGreater(route['avg_queries'], 0)
+        self.assertIn(
+            'includes/post.html', dict(route['templates'])
+        )
+        self.assertGreater(route['cache_misses'], 0)
+
+    @override_settings(PROFILING_SAMPLE_RATE=0)
+    def test_unsampled_request_is_skipped(self):
+        self.client.get(reverse('posts:index_page'))
+        self.assertEqual(profiling.summary(), [])
+
+    def test_duplicate_queries_are_detected(self):
+        profile = profiling.RequestProfile()
+        for _ in range(3):
+            profile(lambda *args: None, 'SELECT 1', (), False, {})
+        profiling.record('route', 0.1, profile)
+        route, = profiling.summary()
+        self.assertEqual(route['duplicates'], [('SELECT 1', 3)])
+
+    def test_dashboard_is_staff_only(self):
+        self.client.get(reverse('posts:index_page'))
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('profiling'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('profiling'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'posts:index_page')
+
+
+@override_settings(RATE_LIMITS={
+    'posts:add_comment': {'rate': '3/m'},
+    'posts:profile_follow': {'rate': '2/m', 'methods': ('GET', 'POST')},
+})
+class RateLimitTest(TestCase):
+    LIMITED = HTTPStatus.TOO_MANY_REQUESTS
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        ratelimit.get_cache().clear()
+        self.client.force_login(self.user)
+        self.url = reverse('posts:add_comment', args=(self.post.pk,))
+
+    def comment(self, **extra):
+        return self.client.post(self.url, {'text': 'Комментарий'}, **extra)
+
+    def test_bucket_rejects_burst_before_view(self):
+        """Сверх ёмкости корзины - 429 без единого SQL-запроса."""
+        for _ in range(3):
+            self.assertEqual(self.comment().status_code, HTTPStatus.FOUND)
+        with self.assertNumQueries(0):
+            response = self.comment()
+        self.assertEqual(response.status_code, self.LIMITED)
+        self.assertEqual(response['Retry-After'], '20')
+        self.assertEqual(self.post.comments.count(), 3)
+        self.assertEqual(
+            ratelimit.rejected_counts(),
+            {'posts:add_comment': 1, 'posts:profile_follow': 0},
+        )
+
+    def test_bucket_refills_over_time(self):
+        now = 1_000_000.0
+        with mock.patch('core.ratelimit.time.time', lambda: now):
+            for _ in range(3):
+                self.comment()
+            self.assertEqual(self.comment().status_code, self.LIMITED)
+        now += 20
+        with mock.patch('core.ratelimit.time.time', lambda: now):
+            self.assertEqual(self.comment().status_code, HTTPStatus.FOUND)
+            self.assertEqual(self.comment().status_code, self.LIMITED)
+
+    def test_idle_bucket_does_not_overfill(self):
+        now = 1_000_000.0
+        with mock.patch('core.ratelimit.time.time', lambda: now):
+            self.comment()
+        now += 3600
+        with mock.patch('core.ratelimit.time.time', lambda: now):
+            codes = [self.comment().status_code for _ in range(4)]
+        self.assertEqual(codes, [HTTPStatus.FOUND] * 3 + [self.LIMITED])
+
+    def test_buckets_per_user_and_ip(self):
+        """Другой пользователь с того же IP упирается в корзину IP."""
+        url = reverse('posts:profile_follow', args=(self.author.username,))
+        for _ in range(2):
+            self.client.get(url)
+        self.assertEqual(self.client.get(url).status_code, self.LIMITED)
+        self.client.force_login(self.author)
+        self.assertEqual(self.client.get(url).status_code, self.LIMITED)
+        response = self.client.get(url, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.client.force_login(self.user)
+        response = self.client.get(url, REMOTE_ADDR='10.0.0.3')
+        self.assertEqual(response.status_code, self.LIMITED)
+
+    def test_take_keeps_bucket_ttl(self):
+        """incr не продлевает и не укорачивает жизнь ключа корзины."""
+        bucket = ratelimit.TokenBucket('ratelimit:test:ip', '5/h')
+        bucket.take()
+        backend = ratelimit.get_cache()
+        key = backend.make_key(bucket.key)
+        expires = backend._expire_info[key]
+        bucket.take()
+        bucket.take()
+        self.assertEqual(backend._expire_info[key], expires)
+        self.assertGreater(expires - time.time(), 3600)
+
+    @override_settings(CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'ratelimit': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': tempfile.gettempdir(),
+        },
+    })
+    def test_non_atomic_backend_fails_at_startup(self):
+        """Файловый кэш не даёт атомарного incr - middleware не стартует."""
+        with self.assertRaises(ImproperlyConfigured):
+            ratelimit.RateLimitMiddleware(lambda request: HttpResponse())
+
+    def test_process_local_cache_warns_without_debug(self):
+        """Без DEBUG корзины в LocMemCache дают предупреждение core.W001."""
+        def warnings():
+            return [message.id for message in
+                    checks.run_checks(tags=[checks.Tags.caches])]
+
+        with override_settings(DEBUG=False):
+            self.assertIn('core.W001', warnings())
+        with override_settings(DEBUG=True):
+            self.assertNotIn('core.W001', warnings())
+        memcached = 'django.core.cache.backends.memcached.PyLibMCCache'
+        with override_settings(DEBUG=False, CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            },
+            'ratelimit': {'BACKEND': memcached, 'LOCATION': '127.0.0.1'},
+        }):
+            self.assertNotIn('core.W001', warnings())
+
+    def test_unlimited_methods_pass(self):
+        for _ in range(5):
+            response = self.client.get(reverse(
+                'posts:post_detail', args=(self.post.pk,)
+            ))
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def setUp(self):
+        self.router = replicas.PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def run_request(self, request, write=False):
+        """Прогоняет запрос через middleware, возвращает БД чтения."""
+        used = {}
+
+        def view(request):
+            used['before'] = self.router.db_for_read(Post)
+            if write:
+                self.router.db_for_write(Post)
+            used['after'] = self.router.db_for_read(Post)
+            return HttpResponse()
+
+        response = replicas.ReplicaStickinessMiddleware(view)(request)
+        return used, response
+
+    def test_safe_request_reads_from_replica(self):
+        used, response = self.run_request(self.factory.get('/'))
+        self.assertEqual(used, {'before': 'replica1', 'after': 'replica1'})
+        self.assertNotIn(replicas.STICKY_COOKIE, response.cookies)
+
+    def test_write_sticks_to_primary(self):
+        """После записи запрос и следующие чтения идут в default."""
+        used, response = self.run_request(self.factory.get('/'), write=True)
+        self.assertEqual(used, {'before': 'replica1', 'after': 'default'})
+        cookie = response.cookies[replicas.STICKY_COOKIE]
+        request = self.factory.get('/')
+        request.COOKIES[replicas.STICKY_COOKIE] = cookie.value
+        used, _ = self.run_request(request)
+        self.assertEqual(used, {'before': 'default', 'after': 'default'})
+
+    def test_unsafe_request_uses_primary(self):
+        used, response = self.run_request(self.factory.post('/'))
+        self.assertEqual(used, {'before': 'default', 'after': 'default'})
+        self.assertIn(replicas.STICKY_COOKIE, response.cookies)
+
+    def test_outside_requests_use_primary(self):
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+
+    def test_new_post_sets_sticky_cookie(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'}
+        )
+        self.assertIn(replicas.STICKY_COOKIE, response.cookies)
+
+
+REPLICA = 'replica1'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaDatabaseTest(TestCase):
+    """Реплика - отдельный файл SQLite, который «догоняет» default только
+    по вызову replicate(), так что отставание реплики видно в тестах."""
+    databases = {'default', REPLICA}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        connections.databases[REPLICA] = dict(
+            connections.databases['default'],
+            NAME=os.path.join(cls.directory, 'replica.sqlite3'),
+            TEST={},
+        )
+        with connections[REPLICA].schema_editor() as editor:
+            for model in (User, Group, Post):
+                editor.create_model(model)
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.replicate()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    @classmethod
+    def replicate(cls):
+        for model in (User, Group, Post):
+            model.objects.using(REPLICA).bulk_create(
+                model.objects.using('default').order_by('pk'),
+                ignore_conflicts=True,
+            )
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def texts(self, request):
+        """Тексты постов, прочитанные в запросе через middleware."""
+        def view(request):
+            return HttpResponse(
+                '|'.join(Post.objects.values_list('text', flat=True))
+            )
+
+        response = replicas.ReplicaStickinessMiddleware(view)(request)
+        return response.content.decode(), response
+
+    def write(self, text):
+        def view(request):
+            Post.objects.create(text=text, author=self.user)
+            return HttpResponse()
+
+        return replicas.ReplicaStickinessMiddleware(view)(
+            self.factory.post('/')
+        )
+
+    def test_reads_hit_replica(self):
+        """Пока реплика отстаёт, GET без куки не видит новый пост."""
+        Post.objects.create(text='Свежий пост', author=self.user)
+        self.assertEqual(self.texts(self.factory.get('/'))[0], '')
+        self.replicate()
+        self.assertEqual(self.texts(self.factory.get('/'))[0], 'Свежий пост')
+
+    def test_sticky_cookie_avoids_stale_read(self):
+        """Автор поста читает его из default, не дожидаясь реплики."""
+        cookie = self.write('Мой пост').cookies[replicas.STICKY_COOKIE]
+        request = self.factory.get('/')
+        request.COOKIES[replicas.STICKY_COOKIE] = cookie.value
+        self.assertEqual(self.texts(request)[0], 'Мой пост')
+        self.assertEqual(self.texts(self.factory.get('/'))[0], '')
+
+
+class ConnectionPoolTest(TestCase):
+    def make_pool(self, **kwargs):
+        options = {'min_size': 0, 'max_size': 2, 'timeout': 0.01,
+                   'max_lifetime': 60, 'pre_ping': True, **kwargs}
+        return ConnectionPool(
+            lambda: sqlite3.connect(':memory:', check_same_thread=False),
+            sqlite3.OperationalError, **options,
+        )
+
+    def test_connection_is_reused(self):
+        pool = self.make_pool()
+        first = pool.checkout()
+        pool.checkin(first)
+        self.assertIs(pool.checkout(), first)
+        self.assertEqual(pool.stats['created'], 1)
+        self.assertEqual(pool.stats['checkouts'], 2)
+
+    def test_checkout_waits_for_free_connection(self):
+        """Сверх MAX_SIZE соединения не открываются, ожидание ограничено."""
+        pool = self.make_pool()
+        pool.checkout()
+        pool.checkout()
+        with self.assertRaises(sqlite3.OperationalError):
+            pool.checkout()
+        self.assertEqual(pool.stats['timeouts'], 1)
+
+    def test_dead_and_old_connections_are_replaced(self):
+        pool = self.make_pool()
+        dead = pool.checkout()
+        pool.checkin(dead)
+        dead.close()
+        self.assertIsNot(pool.checkout(), dead)
+        self.assertEqual(pool.stats['failed_pings'], 1)
+        old_pool = self.make_pool(max_lifetime=0)
+        old = old_pool.checkout()
+        old_pool.checkin(old)
+        self.assertIsNot(old_pool.checkout(), old)
+        self.assertGreaterEqual(old_pool.stats['recycled'], 1)
+
+    def test_fill_opens_min_size_connections(self):
+        pool = self.make_pool(min_size=2)
+        pool.fill()
+        self.assertEqual(pool.describe()['idle'], 2)
+
+    def test_slow_ping_does_not_block_other_checkouts(self):
+        """Проверка соединения идёт без блокировки пула."""
+        pool = self.make_pool(timeout=5)
+        pool.checkin(pool.checkout())
+        pinging, released = threading.Event(), threading.Event()
+
+        def slow_ping(connection):
+            pinging.set()
+            released.wait(5)
+            return True
+
+        with mock.patch.object(pool, '_is_alive', slow_ping):
+            worker = threading.Thread(target=pool.checkout)
+            worker.start()
+            pinging.wait(5)
+            timer = threading.Timer(2, released.set)
+            timer.start()
+            pool.checkout()
+            self.assertFalse(released.is_set())
+            released.set()
+            timer.cancel()
+            worker.join()
+        self.assertEqual(pool.stats['created'], 2)
+
+    def test_checkin_restores_autocommit(self):
+        """Возвращённое соединение - без транзакции и в autocommit."""
+        pool = self.make_pool(
+            reset=lambda c: SQLiteWrapper.reset_autocommit(c, True)
+        )
+        first = pool.checkout()
+        first.isolation_level = None
+        first.execute('CREATE TABLE t (x INTEGER)')
+        first.isolation_level = ''
+        first.execute('INSERT INTO t VALUES (1)')
+        self.assertTrue(first.in_transaction)
+        pool.checkin(first)
+        again = pool.checkout()
+        self.assertIs(again, first)
+        self.assertFalse(again.in_transaction)
+        self.assertIsNone(again.isolation_level)
+        self.assertEqual(again.execute('SELECT COUNT(*) FROM t').fetchone(),
+                         (0,))
+
+    def test_default_database_uses_pool(self):
+        connection.ensure_connection()
+        self.assertIsInstance(connection.pool, ConnectionPool)
+
+
+class StaticPipelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.source = tempfile.mkdtemp()
+        cls.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(cls.source, 'css'))
+        os.makedirs(os.path.join(cls.source, 'img'))
+        with open(os.path.join(cls.source, 'css', 'site.css'), 'w') as f:
+            f.write('body { background: url("../img/logo.png"); }\n' * 20)
+        with open(os.path.join(cls.source, 'img', 'logo.png'), 'wb') as f:
+            f.write(b'png')
+        cls.settings = override_settings(
+            STATICFILES_DIRS=[cls.source],
+            STATIC_ROOT=cls.root,
+            STATICFILES_FINDERS=[
+                'django.contrib.staticfiles.finders.FileSystemFinder',
+            ],
+        )
+        cls.settings.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(cls.root, 'staticfiles.json')) as f:
+            cls.paths = json.load(f)['paths']
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings.disable()
+        shutil.rmtree(cls.source, ignore_errors=True)
+        shutil.rmtree(cls.root, ignore_errors=True)
+        super().tearDownClass()
+
+    def call(self, path, **environ):
+        app = StaticFilesApplication(
+            lambda environ, start_response: [b'app'], self.root, '/static/'
+        )
+        setup_testing_defaults(environ)
+        environ['PATH_INFO'] = path
+        result = {}
+
+        def start_response(status, headers):
+            result['status'], result['headers'] = status, dict(headers)
+
+        result['body'] = b''.join(app(environ, start_response))
+        return result
+
+    def test_collectstatic_hashes_and_compresses(self):
+        """Имена получают хеш, ссылки переписаны, рядом лежит .gz."""
+        css = self.paths['css/site.css']
+        self.assertNotEqual(css, 'css/site.css')
+        path = os.path.join(self.root, css)
+        with open(path) as f:
+            self.assertIn(self.paths['img/logo.png'].split('/')[-1], f.read())
+        with open(path, 'rb') as f, gzip.open(path + '.gz') as compressed:
+            self.assertEqual(compressed.read(), f.read())
+        self.assertFalse(os.path.exists(
+            os.path.join(self.root, self.paths['img/logo.png']) + '.gz'
+        ))
+
+    def test_missing_file_keeps_plain_url(self):
+        self.assertEqual(
+            staticfiles_storage.url('img/missing.ico'),
+            '/static/img/missing.ico',
+        )
+
+    def test_server_picks_precompressed_variant(self):
+        url = '/static/' + self.paths['css/site.css']
+        result = self.call(url, HTTP_ACCEPT_ENCODING='br, gzip')
+        self.assertEqual(result['status'], '200 OK')
+        self.assertEqual(result['headers']['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            result['headers']['Cache-Control'], IMMUTABLE_CACHE_CONTROL
+        )
+        plain = self.call(url)
+        self.assertNotIn('Content-Encoding', plain['headers'])
+        self.assertEqual(gzip.decompress(result['body']), plain['body'])
+        not_modified = self.call(
+            url, HTTP_IF_NONE_MATCH=plain['headers']['ETag']
+        )
+        self.assertEqual(not_modified['status'], '304 Not Modified')
+
+    def test_variants_have_own_etags(self):
+        """У сжатой и исходной копии разные ETag, q=0 запрещает gzip."""
+        url = '/static/' + self.paths['css/site.css']
+        compressed = self.call(url, HTTP_ACCEPT_ENCODING='gzip')
+        plain = self.call(url, HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertNotIn('Content-Encoding', plain['headers'])
+        self.assertEqual(
+            compressed['headers']['ETag'],
+            plain['headers']['ETag'][:-1] + '-gzip"',
+        )
+        stale = self.call(url, HTTP_ACCEPT_ENCODING='gzip',
+                          HTTP_IF_NONE_MATCH=plain['headers']['ETag'])
+        self.assertEqual(stale['status'], '200 OK')
+
+    def test_unhashed_names_are_cached_briefly(self):
+        result = self.call('/static/css/site.css')
+        self.assertNotEqual(
+            result['headers']['Cache-Control'], IMMUTABLE_CACHE_CONTROL
+        )
+
+    def test_other_paths_go_to_application(self):
+        self.assertEqual(self.call('/about/')['body'], b'app')
+        self.assertEqual(self.call('/static/nope.css')['body'], b'app')
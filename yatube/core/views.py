@@ -1,5 +1,10 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.shortcuts import render
 
+from . import profiling, ratelimit
+from .db import pool
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +20,14 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def profiling_dashboard(request):
+    return render(request, 'core/profiling.html', {
+        'routes': profiling.summary(),
+        'pools': pool.pools(),
+        'rate_limited': ratelimit.rejected_counts(),
+        'sample_rate': settings.PROFILING_SAMPLE_RATE,
+        'buffer_size': settings.PROFILING_BUFFER_SIZE,
+    })
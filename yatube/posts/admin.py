@@ -18,7 +18,7 @@ class PostAdmin(admin.ModelAdmin):
 
 
 class GroupAdmin(admin.ModelAdmin):
-    pass
+    list_display = ('title', 'slug', 'posts_count', 'last_post_at')
 
 
 admin.site.register(Group, GroupAdmin)
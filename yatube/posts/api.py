@@ -0,0 +1,221 @@
+"""JSON API версии 1 только для чтения: ленты и пост с комментариями.
+
+Ответы собираются из словарей .values() без создания экземпляров
+моделей, а в SELECT попадают только поля из параметра fields= и ключ
+курсора (pub_date, id). Страницы отдаются keyset-курсором, ETag и 304 -
+по тем же версиям кэша, что и у HTML-страниц.
+"""
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.generic.base import View
+
+from core.pagination import CursorPaginator, InvalidCursor
+from . import cache
+from .feed import get_feed
+from .models import Comment, Group, Post, User
+from .views import ConditionalGetMixin
+
+CURSOR_COLUMNS = ('id', 'pub_date')
+
+
+def _post_url(pk):
+    return reverse('posts:post_detail', args=(pk,))
+
+
+def _media_url(name):
+    return default_storage.url(name) if name else None
+
+
+# Поле ответа -> (колонка .values(), преобразование значения).
+POST_FIELDS = {
+    'id': ('id', None),
+    'text': ('text', None),
+    'author': ('author__username', None),
+    'group': ('group__slug', None),
+    'pub_date': ('pub_date', None),
+    'image': ('image', _media_url),
+    'url': ('id', _post_url),
+}
+COMMENT_FIELDS = {
+    'id': ('id', None),
+    'text': ('text', None),
+    'author': ('author__username', None),
+    'pub_date': ('pub_date', None),
+}
+
+
+class ApiError(Exception):
+    status = 400
+
+
+class NotAuthenticated(ApiError):
+    status = 401
+
+
+def requested_fields(request, available):
+    """Поля из параметра fields=, по умолчанию все доступные."""
+    value = request.GET.get('fields')
+    if not value:
+        return tuple(available)
+    fields = tuple(dict.fromkeys(
+        name.strip() for name in value.split(',') if name.strip()
+    ))
+    unknown = [name for name in fields if name not in available]
+    if unknown or not fields:
+        raise ApiError(
+            f'Неизвестные поля: {", ".join(unknown)}; доступны: '
+            f'{", ".join(available)}'
+        )
+    return fields
+
+
+def columns(fields, available):
+    return {available[name][0] for name in fields} | set(CURSOR_COLUMNS)
+
+
+def serialize(row, fields, available):
+    data = {}
+    for name in fields:
+        column, convert = available[name]
+        value = row[column]
+        data[name] = convert(value) if convert else value
+    return data
+
+
+class JsonApiView(View):
+    """Отдаёт get_data() как JSON, ошибки - JSON с нужным статусом."""
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except ApiError as e:
+            return self.render({'error': str(e)}, status=e.status)
+        except Http404:
+            return self.render({'error': 'Не найдено'}, status=404)
+
+    def get(self, request, *args, **kwargs):
+        return self.render(self.get_data())
+
+    def render(self, data, status=200):
+        # Кириллица без \u-экранирования: ответ почти вдвое короче.
+        return JsonResponse(data, status=status,
+                            json_dumps_params={'ensure_ascii': False})
+
+
+def cursor_page(queryset, per_page, cursor):
+    try:
+        return CursorPaginator(queryset, per_page).page(cursor)
+    except InvalidCursor as e:
+        raise ApiError(str(e))
+
+
+class PostListApiView(ConditionalGetMixin, JsonApiView):
+    paginate_by = settings.COUNT_OF_POSTS_PAGINATOR
+    cursor_kwarg = 'cursor'
+
+    def get_cache_scopes(self):
+        return (cache.POSTS_SCOPE,)
+
+    def get_queryset(self):
+        return Post.objects.all()
+
+    def get_data(self):
+        fields = requested_fields(self.request, POST_FIELDS)
+        queryset = self.get_queryset().values(
+            *columns(fields, POST_FIELDS)
+        )
+        page = cursor_page(queryset, self.paginate_by,
+                           self.request.GET.get(self.cursor_kwarg))
+        return {
+            'results': [
+                serialize(row, fields, POST_FIELDS) for row in page
+            ],
+            'next_cursor': page.next_cursor,
+            'previous_cursor': page.previous_cursor,
+        }
+
+
+class GroupPostsApiView(PostListApiView):
+    def get(self, request, *args, **kwargs):
+        self.group = get_object_or_404(Group, slug=self.kwargs.get('slug'))
+        return super().get(request, *args, **kwargs)
+
+    def get_cache_scopes(self):
+        return (cache.group_scope(self.group.pk),)
+
+    def get_queryset(self):
+        return Post.objects.filter(group=self.group)
+
+
+class ProfileApiView(PostListApiView):
+    def get(self, request, *args, **kwargs):
+        self.author = get_object_or_404(
+            User, username=self.kwargs.get('username')
+        )
+        return super().get(request, *args, **kwargs)
+
+    def get_cache_scopes(self):
+        return (cache.profile_scope(self.author.pk),)
+
+    def get_queryset(self):
+        return Post.objects.filter(author=self.author)
+
+
+class FollowingApiView(PostListApiView):
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            raise NotAuthenticated('Нужно войти в аккаунт')
+        return super().get(request, *args, **kwargs)
+
+    def get_cache_scopes(self):
+        return (cache.POSTS_SCOPE, cache.follow_scope(self.request.user.pk))
+
+    def get_queryset(self):
+        return get_feed(self.request.user)
+
+
+class PostDetailApiView(ConditionalGetMixin, JsonApiView):
+    comments_cursor_kwarg = 'comments_cursor'
+
+    def get(self, request, *args, **kwargs):
+        self.fields = requested_fields(request, POST_FIELDS)
+        self.post = get_object_or_404(
+            Post.objects.values(
+                *columns(self.fields, POST_FIELDS), 'updated_at'
+            ),
+            pk=self.kwargs.get('pk'),
+        )
+        return super().get(request, *args, **kwargs)
+
+    def get_validator_scopes(self):
+        return (cache.post_scope(self.post['id']),)
+
+    def get_etag_parts(self):
+        return [self.post['updated_at'].isoformat()]
+
+    def get_last_modified(self, versions):
+        return max(super().get_last_modified(versions),
+                   self.post['updated_at'])
+
+    def get_data(self):
+        comments = cursor_page(
+            Comment.objects.filter(post_id=self.post['id']).values(
+                *columns(COMMENT_FIELDS, COMMENT_FIELDS)
+            ),
+            settings.COUNT_OF_COMMENTS_PAGINATOR,
+            self.request.GET.get(self.comments_cursor_kwarg),
+        )
+        return {
+            **serialize(self.post, self.fields, POST_FIELDS),
+            'comments': {
+                'results': [
+                    serialize(row, COMMENT_FIELDS, COMMENT_FIELDS)
+                    for row in comments
+                ],
+                'next_cursor': comments.next_cursor,
+                'previous_cursor': comments.previous_cursor,
+            },
+        }
@@ -0,0 +1,327 @@
+"""Нагрузочные замеры маршрутов приложения posts.
+
+Используется командой benchmark_routes: seed() наполняет БД данными
+через mixer и Faker, measure_queries() считает SQL-запросы на маршрут
+тестовым клиентом, run_load() гоняет маршруты конкурентными клиентами
+против живого сервера, compare_reports() ищет регрессии.
+
+render_timings() для команды benchmark_templates рендерит ленту из
+несохранённых постов без кэша фрагментов и сравнивает загрузчики
+шаблонов и кэш адресов.
+"""
+import json
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+
+import requests
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.core.paginator import Paginator
+from django.db import connection
+from django.template import Engine, RequestContext, engines
+from django.test import Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+from mixer.backend.django import mixer
+
+from .models import Comment, Follow, Group, Post, User
+from .templatetags import post_links
+
+ROUTES = (
+    'index_page',
+    'group_list',
+    'profile',
+    'post_detail',
+    'follow_index',
+    'profile_follow',
+    'profile_unfollow',
+)
+AUTH_ROUTES = ('follow_index', 'profile_follow', 'profile_unfollow')
+POST_ROUTES = ('profile_follow', 'profile_unfollow')
+# Секрет CSRF нагрузочных клиентов: одинаковые cookie и заголовок.
+BENCHMARK_CSRF_TOKEN = 'b' * 32
+# Кэши замера: в памяти процесса, общий с потоком живого сервера.
+BENCHMARK_CACHES = {
+    alias: {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': f'benchmark-{alias}',
+    }
+    for alias in ('default', settings.RATE_LIMIT_CACHE)
+}
+# SQLite ограничивает число строк в одном составном INSERT.
+BATCH_SIZE = 200
+
+
+def seed(users=200, groups=20, posts=5000, comments=20000, follows=2000,
+         seed_value=0):
+    """Наполняет БД данными; производные таблицы пересчитываются командами."""
+    fake = Faker('ru_RU')
+    Faker.seed(seed_value)
+    rnd = random.Random(seed_value)
+    authors = mixer.cycle(users).blend(
+        User, username=mixer.sequence('bench_user_{0}')
+    )
+    group_list = mixer.cycle(groups).blend(
+        Group, slug=mixer.sequence('bench-group-{0}')
+    )
+    Post.objects.bulk_create(
+        (Post(text=fake.text(), author=rnd.choice(authors),
+              group=rnd.choice(group_list + [None]))
+         for _ in range(posts)),
+        batch_size=BATCH_SIZE,
+    )
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    Comment.objects.bulk_create(
+        (Comment(text=fake.sentence(), author=rnd.choice(authors),
+                 post_id=rnd.choice(post_ids))
+         for _ in range(comments)),
+        batch_size=BATCH_SIZE,
+    )
+    pairs = set()
+    while len(pairs) < min(follows, users * (users - 1)):
+        user, author = rnd.sample(authors, 2)
+        pairs.add((user, author))
+    for user, author in pairs:
+        Follow.objects.create(user=user, author=author)
+    call_command('rebuild_author_stats', stdout=StringIO())
+    call_command('rebuild_search_index', stdout=StringIO())
+
+
+def route_urls():
+    """Случайный набор аргументов для каждого маршрута."""
+    post = Post.objects.order_by('?').select_related('author').first()
+    group = Group.objects.order_by('?').first()
+    author = User.objects.exclude(posts=None).order_by('?').first()
+    return {
+        'index_page': reverse('posts:index_page'),
+        'group_list': reverse('posts:group_list', args=(group.slug,)),
+        'profile': reverse('posts:profile', args=(author.username,)),
+        'post_detail': reverse('posts:post_detail', args=(post.pk,)),
+        'follow_index': reverse('posts:follow_index'),
+        'profile_follow': reverse('posts:profile_follow',
+                                  args=(author.username,)),
+        'profile_unfollow': reverse('posts:profile_unfollow',
+                                    args=(author.username,)),
+    }
+
+
+def _rows_scanned(queries):
+    if connection.vendor != 'postgresql':
+        return None
+    rows = 0
+    with connection.cursor() as cursor:
+        for query in queries:
+            if not query['sql'].lstrip().upper().startswith('SELECT'):
+                continue
+            cursor.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + query['sql'])
+            plan = cursor.fetchone()[0]
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            rows += _plan_rows(plan[0]['Plan'])
+    return rows
+
+
+def _plan_rows(node):
+    rows = 0
+    if 'Scan' in node['Node Type']:
+        rows += node['Actual Rows'] * node.get('Actual Loops', 1)
+        rows += node.get('Rows Removed by Filter', 0)
+    for child in node.get('Plans', ()):
+        rows += _plan_rows(child)
+    return rows
+
+
+def measure_queries(user, urls):
+    """Число SQL-запросов и просмотренных строк на запрос к маршруту."""
+    anonymous, authorised = Client(), Client()
+    authorised.force_login(user)
+    result = {}
+    for name, url in urls.items():
+        client = authorised if name in AUTH_ROUTES else anonymous
+        request = client.post if name in POST_ROUTES else client.get
+        request(url)
+        with CaptureQueriesContext(connection) as context:
+            request(url)
+        result[name] = {
+            'queries': len(context.captured_queries),
+            'rows_scanned': _rows_scanned(context.captured_queries),
+        }
+    return result
+
+
+def _percentile(cut_points, percent):
+    return round(cut_points[percent - 1] * 1000, 3)
+
+
+def run_load(base_url, urls, session_cookies, requests_per_route=200,
+             concurrency=8):
+    """Конкурентно запрашивает маршруты, возвращает перцентили задержки."""
+    sessions = []
+    for cookie in session_cookies[:concurrency]:
+        session = requests.Session()
+        session.cookies.update(cookie)
+        session.cookies[settings.CSRF_COOKIE_NAME] = BENCHMARK_CSRF_TOKEN
+        sessions.append(session)
+
+    def fetch(args):
+        index, name, url = args
+        session = sessions[index % len(sessions)]
+        started = time.perf_counter()
+        if name in POST_ROUTES:
+            response = session.post(
+                base_url + url, allow_redirects=False,
+                headers={'X-CSRFToken': BENCHMARK_CSRF_TOKEN},
+            )
+        else:
+            response = session.get(base_url + url, allow_redirects=False)
+        return time.perf_counter() - started, response.status_code < 400
+
+    report = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for name, url in urls.items():
+            jobs = [(i, name, url) for i in range(requests_per_route)]
+            started = time.perf_counter()
+            results = list(executor.map(fetch, jobs))
+            elapsed = time.perf_counter() - started
+            latencies = [latency for latency, _ in results]
+            cut_points = statistics.quantiles(latencies, n=100)
+            report[name] = {
+                'p50_ms': _percentile(cut_points, 50),
+                'p95_ms': _percentile(cut_points, 95),
+                'p99_ms': _percentile(cut_points, 99),
+                'rps': round(len(results) / elapsed, 1),
+                'errors': sum(1 for _, ok in results if not ok),
+            }
+    return report
+
+
+def compare_reports(baseline, current, max_regression=0.25):
+    """Список регрессий относительно прошлого отчёта."""
+    problems = []
+    for name, old in baseline['routes'].items():
+        new = current['routes'].get(name)
+        if new is None:
+            continue
+        if new['queries'] > old['queries']:
+            problems.append(
+                f'{name}: запросов {old["queries"]} -> {new["queries"]}'
+            )
+        if new.get('errors', 0) > old.get('errors', 0):
+            problems.append(
+                f'{name}: ошибок {old.get("errors", 0)} -> {new["errors"]}'
+            )
+        old_p95, new_p95 = old.get('p95_ms'), new.get('p95_ms')
+        if old_p95 and new_p95 and new_p95 > old_p95 * (1 + max_regression):
+            problems.append(f'{name}: p95 {old_p95} -> {new_p95} мс')
+    return problems
+
+
+PAGE_TEMPLATE = 'posts/index.html'
+PAGE_SIZES = (10, 50, 100)
+# Без кэша фрагментов каждый рендер проходит post.html целиком.
+NO_FRAGMENT_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+def sample_page(count):
+    """Страница из count несохранённых постов: рендер без запросов к БД."""
+    author = User(pk=1, username='benchmark', first_name='Лев',
+                  last_name='Толстой')
+    group = Group(pk=1, title='Замеры', slug='benchmark')
+    now = timezone.now()
+    posts = []
+    for pk in range(count, 0, -1):
+        post = Post(pk=pk, text=f'Пост номер {pk}. ' * 10, author=author,
+                    group=group, pub_date=now)
+        post.cache_version = 0
+        posts.append(post)
+    return Paginator(posts, max(count, 1)).page(1)
+
+
+def _engine(loaders):
+    """Движок с настройками проекта, но с другими загрузчиками."""
+    base = engines['django'].engine
+    return Engine(
+        dirs=base.dirs,
+        context_processors=base.context_processors,
+        loaders=loaders,
+        libraries=base.libraries,
+        builtins=base.builtins[len(Engine.default_builtins):],
+    )
+
+
+def render_modes():
+    """Режим -> (движок, сбрасывать ли кэш адресов перед рендером)."""
+    uncached = _engine(settings.TEMPLATE_LOADERS)
+    cached = _engine([
+        ('django.template.loaders.cached.Loader', settings.TEMPLATE_LOADERS),
+    ])
+    return {
+        'без кэша': (uncached, True),
+        'кэш шаблонов': (cached, True),
+        'кэш шаблонов и адресов': (cached, False),
+    }
+
+
+def _median_render(engine, clear_urls, context, request, repeat):
+    timings = []
+    for _ in range(repeat):
+        if clear_urls:
+            post_links._reverse.cache_clear()
+        start = time.perf_counter()
+        # get_template на каждый рендер, как на каждый запрос.
+        engine.get_template(PAGE_TEMPLATE).render(
+            RequestContext(request, context)
+        )
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def _page_context(size):
+    page = sample_page(size)
+    return {
+        'page_obj': page,
+        'paginator': page.paginator,
+        'index': True,
+        'page_cache_key': size,
+        'cache_seconds': 0,
+        'fragment_cache_seconds': 0,
+    }
+
+
+def render_timings(sizes=PAGE_SIZES, repeat=50):
+    """Медиана рендера ленты и микросекунды на пост по режимам.
+
+    На пост приходится разница с рендером пустой страницы: шапка,
+    переключатель вкладок и пагинатор в неё не попадают.
+    """
+    request = RequestFactory().get('/')
+    request.user = AnonymousUser()
+    contexts = {size: _page_context(size) for size in (0, *sizes)}
+    report = {}
+    with override_settings(CACHES=NO_FRAGMENT_CACHE):
+        for mode, (engine, clear_urls) in render_modes().items():
+            # Прогрев: загрузка библиотек тегов и первая компиляция.
+            _median_render(engine, clear_urls, contexts[0], request, 1)
+            empty = _median_render(
+                engine, clear_urls, contexts[0], request, repeat
+            )
+            rows = {}
+            for size in sizes:
+                seconds = _median_render(
+                    engine, clear_urls, contexts[size], request, repeat
+                )
+                rows[size] = {
+                    'page_ms': round(seconds * 1000, 3),
+                    'us_per_post': round(
+                        (seconds - empty) / size * 1_000_000, 1
+                    ),
+                }
+            report[mode] = rows
+    return report
@@ -0,0 +1,88 @@
+"""Версии кэшированных фрагментов страниц и постов.
+
+Версия области (лента, группа, профиль, автор, пост) хранится в общем
+кэше и входит в ключ фрагмента. Сигналы Post, Comment, Follow, Group и
+User увеличивают версию, после чего старые фрагменты больше не читаются
+и вытесняются по таймауту.
+
+Версия - время последнего изменения области в миллисекундах, поэтому
+она же служит валидатором Last-Modified и ETag для условных GET.
+"""
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'posts:version:{}'
+COUNT_KEY = 'posts:count:{}'
+
+POSTS_SCOPE = 'posts'
+TRENDING_SCOPE = 'trending'
+GROUPS_SCOPE = 'groups'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def profile_scope(author_id):
+    return f'profile:{author_id}'
+
+
+def author_scope(author_id):
+    """Данные пользователя как автора: имя на страницах его постов."""
+    return f'author:{author_id}'
+
+
+def follow_scope(user_id):
+    return f'follow:{user_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def _now_version():
+    # Версия от времени: если ключ версии вытеснен из кэша, новая версия
+    # не совпадёт со старыми фрагментами и окажется новее прежней.
+    return int(time.time() * 1000)
+
+
+def get_versions(scopes):
+    keys = {VERSION_KEY.format(scope): scope for scope in scopes}
+    found = cache.get_many(keys)
+    versions = {}
+    for key, scope in keys.items():
+        if key not in found:
+            cache.add(key, _now_version(), timeout=None)
+            found[key] = cache.get(key)
+        versions[scope] = found[key]
+    return versions
+
+
+def bump(*scopes):
+    now = _now_version()
+    for scope in scopes:
+        key = VERSION_KEY.format(scope)
+        version = max(cache.get(key, 0) + 1, now)
+        cache.set(key, version, timeout=None)
+
+
+def last_modified(versions):
+    """Время последнего изменения по версиям областей."""
+    return datetime.fromtimestamp(
+        max(versions.values()) / 1000, tz=timezone.utc
+    )
+
+
+def cached_count(versions, count_func):
+    """Число объектов; count_func вызывается один раз на набор версий."""
+    key = COUNT_KEY.format(
+        ':'.join(f'{scope}={versions[scope]}' for scope in sorted(versions))
+    )
+    count = cache.get(key)
+    if count is None:
+        count = count_func()
+        cache.set(key, count, settings.CACHE_FRAGMENT_SECONDS)
+    return count
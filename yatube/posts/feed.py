@@ -0,0 +1,145 @@
+"""Лента подписок с разносом постов при записи (fan-out on write).
+
+Новый пост раскладывается в FeedEntry каждого подписчика автора, поэтому
+страница подписок читает одну индексированную таблицу. Когда подписчиков
+у автора становится больше FEED_FANOUT_MAX_FOLLOWERS, он помечается
+feed_pulled и его посты подмешиваются в ленту при чтении. Обратно на
+разнос автора переводит команда backfill_feeds, когда подписчиков стало
+не больше FEED_FANOUT_MIN_FOLLOWERS: она раскладывает его посты по лентам
+порциями, а запросы подписки и отписки ничего массово не пишут. Зазор
+между порогами не даёт автору у границы переключаться туда и обратно.
+"""
+from django.conf import settings
+from django.db.models import Max, Q
+
+from .models import AuthorStats, FeedEntry, Follow, Post
+
+
+def is_pulled_author(author_id):
+    return AuthorStats.objects.filter(
+        user_id=author_id, feed_pulled=True
+    ).exists()
+
+
+def pulled_author_ids(user):
+    """Авторы из подписок пользователя, чьи посты читаются без ленты."""
+    return list(
+        Follow.objects.filter(
+            user=user, author__stats__feed_pulled=True
+        ).values_list('author_id', flat=True)
+    )
+
+
+def fan_out_post(post):
+    if is_pulled_author(post.author_id):
+        return
+    follower_ids = (
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)
+    )
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post=post, author_id=post.author_id,
+                   pub_date=post.pub_date)
+         for user_id in follower_ids.iterator()),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def _recent_posts(author_id):
+    return list(
+        Post.objects.filter(author_id=author_id)
+        .values_list('pk', 'pub_date')[:settings.FEED_BACKFILL_SIZE]
+    )
+
+
+def _create_entries(user_id, author_id, posts):
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post_id=pk, author_id=author_id,
+                   pub_date=pub_date)
+         for pk, pub_date in posts),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_feed(follow):
+    if is_pulled_author(follow.author_id):
+        return
+    _create_entries(follow.user_id, follow.author_id,
+                    _recent_posts(follow.author_id))
+
+
+def follow(follow):
+    # Счётчик уже увеличен сигналом.
+    AuthorStats.objects.filter(
+        user_id=follow.author_id,
+        feed_pulled=False,
+        followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS,
+    ).update(feed_pulled=True)
+    backfill_feed(follow)
+
+
+def authors_to_push():
+    """Авторы без разноса, у которых подписчиков стало не больше
+    FEED_FANOUT_MIN_FOLLOWERS."""
+    return list(
+        AuthorStats.objects.filter(
+            feed_pulled=True,
+            followers_count__lte=settings.FEED_FANOUT_MIN_FOLLOWERS,
+        ).order_by('user_id').values_list('user_id', flat=True)
+    )
+
+
+def push_author(author_id, max_rows):
+    """Раскладывает последние посты автора по лентам подписчиков.
+
+    Пишет не больше max_rows строк (но хотя бы одну ленту). Если лимита
+    не хватило, автор остаётся без разноса, а следующий запуск пропустит
+    ленты, где уже есть его последний пост. Возвращает число записанных
+    строк и признак того, что автор переведён на разнос.
+    """
+    last_pk = (
+        Post.objects.filter(author_id=author_id).aggregate(Max('pk'))
+    )['pk__max'] or 0
+    posts = _recent_posts(author_id)
+    written = 0
+    if posts:
+        done = set(
+            FeedEntry.objects.filter(post_id=posts[0][0])
+            .values_list('user_id', flat=True)
+        )
+        follower_ids = (
+            Follow.objects.filter(author_id=author_id)
+            .order_by('user_id').values_list('user_id', flat=True)
+        )
+        for user_id in follower_ids.iterator():
+            if user_id in done:
+                continue
+            if written and written + len(posts) > max_rows:
+                return written, False
+            _create_entries(user_id, author_id, posts)
+            written += len(posts)
+    AuthorStats.objects.filter(user_id=author_id).update(feed_pulled=False)
+    # Посты, вышедшие во время переноса, разносятся обычным путём.
+    for post in Post.objects.filter(author_id=author_id, pk__gt=last_pk):
+        fan_out_post(post)
+    return written, True
+
+
+def trim_feed(follow):
+    FeedEntry.objects.filter(
+        user_id=follow.user_id,
+        author_id=follow.author_id,
+    ).delete()
+
+
+def get_feed(user):
+    pulled = pulled_author_ids(user)
+    if not pulled:
+        return (Post.objects.filter(feed_entries__user=user)
+                .order_by('-feed_entries__pub_date'))
+    return Post.objects.filter(
+        Q(pk__in=FeedEntry.objects.filter(user=user).values('post_id'))
+        | Q(author_id__in=pulled)
+    )
@@ -0,0 +1,55 @@
+"""Нормализация картинок постов при загрузке.
+
+Картинка поворачивается по EXIF, теряет метаданные, уменьшается до
+IMAGE_MAX_SIDE по большей стороне и пересохраняется: в WebP, если его
+поддерживает Pillow, иначе в JPEG, а с прозрачностью - в PNG. GIF
+остаются как есть, чтобы не терять анимацию.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import features, Image, ImageOps
+
+PASSTHROUGH_FORMATS = ('GIF',)
+
+
+def has_transparency(image):
+    if image.mode in ('RGBA', 'LA'):
+        return image.getchannel('A').getextrema()[0] < 255
+    return image.mode == 'P' and 'transparency' in image.info
+
+
+def output_format(transparent):
+    if features.check('webp'):
+        return 'WEBP', '.webp', 'image/webp'
+    if transparent:
+        return 'PNG', '.png', 'image/png'
+    return 'JPEG', '.jpg', 'image/jpeg'
+
+
+def normalize_image(uploaded):
+    """Возвращает новый файл для загруженной картинки или её саму."""
+    uploaded.seek(0)
+    image = Image.open(uploaded)
+    if image.format in PASSTHROUGH_FORMATS:
+        uploaded.seek(0)
+        return uploaded
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail(
+        (settings.IMAGE_MAX_SIDE, settings.IMAGE_MAX_SIDE), Image.LANCZOS
+    )
+    transparent = has_transparency(image)
+    image_format, extension, content_type = output_format(transparent)
+    # Пересборка из пикселей отбрасывает EXIF, ICC и текстовые блоки.
+    image = image.convert('RGBA' if transparent else 'RGB')
+    options = {'optimize': True}
+    if image_format in ('WEBP', 'JPEG'):
+        options['quality'] = settings.IMAGE_QUALITY
+    if image_format == 'JPEG':
+        options['progressive'] = True
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    name = os.path.splitext(os.path.basename(uploaded.name))[0] + extension
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type)
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import feed
+
+
+class Command(BaseCommand):
+    help = ('Возвращает разнос в ленты авторам, у которых стало меньше '
+            'подписчиков; запускается периодически, например из cron')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-rows', type=int, default=settings.FEED_BACKFILL_MAX_ROWS,
+            help='Сколько строк лент записать за запуск',
+        )
+
+    def handle(self, *args, **options):
+        written = pushed = 0
+        for author_id in feed.authors_to_push():
+            if written >= options['max_rows']:
+                break
+            rows, done = feed.push_author(
+                author_id, options['max_rows'] - written
+            )
+            written += rows
+            pushed += done
+        self.stdout.write(self.style.SUCCESS(
+            f'Авторов переведено на разнос: {pushed}, '
+            f'записей в лентах: {written}'
+        ))
@@ -0,0 +1,187 @@
+import json
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.staticfiles.handlers import StaticFilesHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.test.testcases import LiveServerThread
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from posts import benchmarks
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет тестовую БД, гоняет маршруты posts конкурентными '
+        'клиентами через живой сервер и пишет JSON-отчёт с перцентилями '
+        'задержки и числом запросов. С --baseline завершается ошибкой '
+        'при регрессии.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=2000)
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Запросов на каждый маршрут')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--output', default='benchmark.json')
+        parser.add_argument('--baseline',
+                            help='Прошлый отчёт для поиска регрессий')
+        parser.add_argument('--max-regression', type=float, default=0.25,
+                            help='Допустимый рост p95, доля')
+        parser.add_argument('--keepdb', action='store_true')
+        parser.add_argument(
+            '--compare-pooling', action='store_true',
+            help='Повторить нагрузку без пула соединений и сравнить RPS',
+        )
+
+    def shares_connection(self):
+        connection = connections['default']
+        return connection.vendor == 'sqlite' and connection.is_in_memory_db()
+
+    def start_server(self):
+        connections_override = {}
+        for conn in connections.all():
+            if conn.vendor == 'sqlite' and conn.is_in_memory_db():
+                conn.inc_thread_sharing()
+                connections_override[conn.alias] = conn
+        server = LiveServerThread(
+            'localhost', StaticFilesHandler, connections_override
+        )
+        server.daemon = True
+        server.start()
+        server.is_ready.wait()
+        if server.error:
+            raise server.error
+        return server
+
+    def stop_server(self, server):
+        server.terminate()
+        for conn in server.connections_override.values():
+            conn.dec_thread_sharing()
+
+    def session_cookies(self, users):
+        cookies = []
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            name = settings.SESSION_COOKIE_NAME
+            cookies.append({name: client.cookies[name].value})
+        return cookies
+
+    # Нагрузка идёт с одного IP: лимиты частоты запросов её бы обрезали.
+    # Кэши свои, в памяти: общий кэш сайта с версиями областей и
+    # фрагментами замер не трогает.
+    @override_settings(RATE_LIMITS={}, CACHES=benchmarks.BENCHMARK_CACHES)
+    def run_benchmark(self, options):
+        if options['compare_pooling'] and self.shares_connection():
+            raise CommandError(
+                '--compare-pooling бессмысленен на in-memory SQLite: все '
+                'потоки сервера работают через одно соединение. Нужна '
+                'тестовая БД на сервере или в файле (TEST NAME).'
+            )
+        benchmarks.seed(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows=options['follows'],
+        )
+        urls = benchmarks.route_urls()
+        readers = list(
+            User.objects.filter(follower__isnull=False)
+            .distinct()[:options['concurrency']]
+        )
+        routes = benchmarks.measure_queries(readers[0], urls)
+        cookies = self.session_cookies(readers)
+        server = self.start_server()
+        try:
+            if options['compare_pooling']:
+                with self.pooling(False):
+                    unpooled = self.run_load(server, urls, cookies, options)
+                for name, metrics in unpooled.items():
+                    routes[name]['rps_without_pool'] = metrics['rps']
+                    routes[name]['p95_ms_without_pool'] = metrics['p95_ms']
+            with self.pooling(True):
+                load = self.run_load(server, urls, cookies, options)
+        finally:
+            self.stop_server(server)
+        for name, metrics in load.items():
+            routes[name].update(metrics)
+        return routes
+
+    def run_load(self, server, urls, cookies, options):
+        return benchmarks.run_load(
+            f'http://{server.host}:{server.port}',
+            urls,
+            cookies,
+            requests_per_route=options['requests'],
+            concurrency=options['concurrency'],
+        )
+
+    @contextmanager
+    def pooling(self, enabled):
+        """Включает или выключает пул default для новых соединений."""
+        options = connections['default'].settings_dict.setdefault('POOL', {})
+        previous = options.get('ENABLED', True)
+        options['ENABLED'] = enabled
+        try:
+            yield
+        finally:
+            options['ENABLED'] = previous
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(
+            verbosity=0, interactive=False, keepdb=options['keepdb']
+        )
+        try:
+            routes = self.run_benchmark(options)
+        finally:
+            teardown_databases(old_config, verbosity=0,
+                               keepdb=options['keepdb'])
+            teardown_test_environment()
+        report = {
+            'meta': {
+                key: options[key] for key in (
+                    'users', 'groups', 'posts', 'comments', 'follows',
+                    'requests', 'concurrency', 'compare_pooling',
+                )
+            },
+            'routes': routes,
+        }
+        with open(options['output'], 'w') as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+        for name, metrics in routes.items():
+            self.stdout.write(
+                f'{name:18} p50 {metrics["p50_ms"]:8.2f} мс  '
+                f'p95 {metrics["p95_ms"]:8.2f} мс  '
+                f'p99 {metrics["p99_ms"]:8.2f} мс  '
+                f'{metrics["rps"]:7.1f} rps  '
+                f'запросов {metrics["queries"]}  '
+                f'ошибок {metrics["errors"]}'
+            )
+            if 'rps_without_pool' in metrics:
+                self.stdout.write(
+                    f'{"":18} без пула {metrics["rps_without_pool"]:7.1f} '
+                    f'rps, p95 {metrics["p95_ms_without_pool"]:8.2f} мс'
+                )
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)
+            problems = benchmarks.compare_reports(
+                baseline, report, options['max_regression']
+            )
+            if problems:
+                raise CommandError('\n'.join(problems))
@@ -0,0 +1,36 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from posts import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Рендерит ленту из 10, 50 и 100 постов без кэша фрагментов и '
+        'печатает время страницы и микросекунды на пост для загрузчика '
+        'без кэша, cached.Loader и кэша адресов {% cached_url %}.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+',
+                            default=list(benchmarks.PAGE_SIZES),
+                            help='Постов на странице')
+        parser.add_argument('--repeat', type=int, default=50,
+                            help='Рендеров на каждый размер страницы')
+        parser.add_argument('--output', help='Куда записать JSON-отчёт')
+
+    def handle(self, *args, **options):
+        report = benchmarks.render_timings(
+            options['sizes'], options['repeat']
+        )
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2, ensure_ascii=False)
+        for mode, rows in report.items():
+            for size, metrics in rows.items():
+                self.stdout.write(
+                    f'{mode:24} постов {size:4}  '
+                    f'страница {metrics["page_ms"]:8.2f} мс  '
+                    f'{metrics["us_per_post"]:8.1f} мкс/пост'
+                )
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = ('Применяет затухание к рейтингам популярных постов; '
+            'запускается периодически, например из cron раз в час')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Пересчитать рейтинги по комментариям с нуля',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            total = trending.rebuild()
+            self.stdout.write(self.style.SUCCESS(
+                f'Рейтинги пересчитаны, постов: {total}'
+            ))
+            return
+        updated, deleted = trending.decay()
+        self.stdout.write(self.style.SUCCESS(
+            f'Рейтингов приведено: {updated}, удалено строк: {deleted}'
+        ))
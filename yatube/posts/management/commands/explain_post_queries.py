@@ -0,0 +1,50 @@
+from timeit import Timer
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.feed import get_feed
+from posts.models import Follow, Group, Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает планы и время основных запросов ленты, профиля, '
+        'группы и проверки подписки. Запустите до и после миграции '
+        'индексов, чтобы сравнить планы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Читатель ленты')
+        parser.add_argument('--author', help='Автор для профиля')
+        parser.add_argument('--group', help='slug группы')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def get_instance(self, queryset, **lookup):
+        lookup = {key: value for key, value in lookup.items() if value}
+        instance = queryset.filter(**lookup).first()
+        if instance is None:
+            raise CommandError(f'Не найден объект {queryset.model.__name__}')
+        return instance
+
+    def get_queries(self, options):
+        user = self.get_instance(User.objects, username=options['user'])
+        author = self.get_instance(User.objects, username=options['author'])
+        group = self.get_instance(Group.objects, slug=options['group'])
+        page = settings.COUNT_OF_POSTS_PAGINATOR
+        return {
+            'follow_check': Follow.objects.filter(author=author, user=user),
+            'profile': Post.objects.filter(author=author)[:page],
+            'group_list': Post.objects.filter(group=group)[:page],
+            'follow_index': get_feed(user)[:page],
+        }
+
+    def handle(self, *args, **options):
+        for name, queryset in self.get_queries(options).items():
+            timer = Timer(lambda: list(queryset.all()))
+            seconds = timer.timeit(number=options['repeat'])
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(queryset.explain())
+            self.stdout.write(
+                f'{seconds / options["repeat"] * 1000:.3f} мс на запрос\n'
+            )
@@ -0,0 +1,46 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Выгружает пользователей, группы, посты, комментарии и подписки '
+            'в файлы JSONL или CSV. У пользователей сохраняются is_staff, '
+            'is_superuser и last_login; группы и отдельные права '
+            'django.contrib.auth не выгружаются')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог для файлов выгрузки')
+        parser.add_argument(
+            '--format', choices=transfer.FORMATS, default='jsonl',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Продолжить прерванную выгрузку в тот же каталог',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=settings.TRANSFER_BATCH_SIZE,
+        )
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        file_format = options['format']
+        os.makedirs(directory, exist_ok=True)
+        state_path = os.path.join(directory, transfer.EXPORT_STATE)
+        state = transfer.read_state(state_path) if options['resume'] else {}
+        if state.get('format', file_format) != file_format:
+            raise CommandError(
+                f'Прерванная выгрузка в формате {state["format"]}'
+            )
+        state['format'] = file_format
+        for name, model, fields in transfer.ENTITIES:
+            rows = transfer.export_entity(
+                directory, name, model, fields, file_format, state,
+                state_path, options['chunk_size'],
+            )
+            self.stdout.write(f'{name}: {rows}')
+        self.stdout.write(self.style.SUCCESS(f'Выгрузка в {directory} готова'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate_thumbnail
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие миниатюры картинок постов'
+
+    def handle(self, *args, **options):
+        posts = (Post.objects.exclude(image='')
+                 .values_list('pk', 'image').iterator())
+        total = 0
+        for post_id, image_name in posts:
+            generate_thumbnail(image_name, post_id)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {total}'
+        ))
@@ -0,0 +1,62 @@
+import os
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import cache, stats, transfer
+
+
+class Command(BaseCommand):
+    help = ('Загружает выгрузку export_content; файлы картинок из MEDIA_ROOT '
+            'переносятся отдельно')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог с файлами выгрузки')
+        parser.add_argument(
+            '--format', choices=transfer.FORMATS, default='jsonl',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Пропустить строки, загруженные до прерывания',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.TRANSFER_BATCH_SIZE,
+        )
+        parser.add_argument(
+            '--skip-rebuild',
+            action='store_true',
+            help='Не пересчитывать счётчики, ленты и поисковый индекс',
+        )
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        file_format = options['format']
+        if not os.path.isdir(directory):
+            raise CommandError(f'Нет каталога {directory}')
+        state_path = os.path.join(directory, transfer.IMPORT_STATE)
+        state = transfer.read_state(state_path) if options['resume'] else {}
+        if state.get('format', file_format) != file_format:
+            raise CommandError(
+                f'Прерванная загрузка в формате {state["format"]}'
+            )
+        state['format'] = file_format
+        for name, model, _ in transfer.ENTITIES:
+            rows = transfer.import_entity(
+                directory, name, model, file_format, state, state_path,
+                options['batch_size'],
+            )
+            self.stdout.write(f'{name}: {rows}')
+        transfer.reset_sequences()
+        if not options['skip_rebuild']:
+            # Порядок как у сигналов: ленты читают счётчики подписчиков.
+            call_command('rebuild_author_stats', stdout=StringIO())
+            stats.refresh_group_stats()
+            cache.bump(cache.GROUPS_SCOPE)
+            transfer.backfill_feeds()
+            call_command('rebuild_search_index', stdout=StringIO())
+        self.stdout.write(self.style.SUCCESS(
+            f'Загрузка из {directory} готова'
+        ))
@@ -0,0 +1,53 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import AuthorStats
+from posts.stats import actual_counters
+
+FIELDS = ('posts_count', 'followers_count', 'following_count')
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов и подписок авторов с нуля'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только показать расхождения, ничего не изменяя',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rows = actual_counters().iterator()
+        mismatched = 0
+        while True:
+            batch = list(islice(rows, options['batch_size']))
+            if not batch:
+                break
+            stored = AuthorStats.objects.in_bulk([row[0] for row in batch])
+            to_create, to_update = [], []
+            for user_id, *counters in batch:
+                actual = dict(zip(FIELDS, counters))
+                stats = stored.get(user_id)
+                if stats is None:
+                    to_create.append(AuthorStats(user_id=user_id, **actual))
+                    continue
+                if any(getattr(stats, f) != v for f, v in actual.items()):
+                    for field, value in actual.items():
+                        setattr(stats, field, value)
+                    to_update.append(stats)
+            mismatched += len(to_update)
+            if options['check']:
+                continue
+            with transaction.atomic():
+                AuthorStats.objects.bulk_create(to_create)
+                AuthorStats.objects.bulk_update(to_update, FIELDS)
+        if options['check']:
+            self.stdout.write(f'Расхождений в счётчиках: {mismatched}')
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Счётчики пересчитаны, исправлено: {mismatched}'
+            ))
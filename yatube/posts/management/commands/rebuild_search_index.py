@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from posts.models import Comment, Post, SearchDocument
+from posts.search import FTS_TABLE, has_fts5
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс постов и комментариев'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='По умолчанию размер пачки выбирает бэкенд БД',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        with transaction.atomic():
+            SearchDocument.objects.all().delete()
+            SearchDocument.objects.bulk_create(
+                (SearchDocument(post_id=pk, text=text) for pk, text in
+                 Post.objects.values_list('pk', 'text').iterator()),
+                batch_size=batch_size,
+            )
+            SearchDocument.objects.bulk_create(
+                (SearchDocument(post_id=post_id, comment_id=pk, text=text)
+                 for pk, post_id, text in
+                 Comment.objects.values_list('pk', 'post_id', 'text')
+                 .iterator()),
+                batch_size=batch_size,
+            )
+            if connection.vendor == 'sqlite' and has_fts5():
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) "
+                        "VALUES ('rebuild')"
+                    )
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано документов: {SearchDocument.objects.count()}'
+        ))
@@ -0,0 +1,41 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:23
+
+from django.db import migrations
+from django.db.models import Count, F, Min
+from django.db.models.functions import Greatest
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    duplicates = (
+        Follow.objects.order_by().values('user_id', 'author_id')
+        .annotate(keep=Min('pk'), total=Count('pk'))
+        .filter(total__gt=1)
+    )
+    for row in duplicates.iterator():
+        removed, _ = (
+            Follow.objects.filter(user_id=row['user_id'],
+                                  author_id=row['author_id'])
+            .exclude(pk=row['keep'])
+            .delete()
+        )
+        AuthorStats.objects.filter(user_id=row['author_id']).update(
+            followers_count=Greatest(F('followers_count') - removed, 0)
+        )
+        AuthorStats.objects.filter(user_id=row['user_id']).update(
+            following_count=Greatest(F('following_count') - removed, 0)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_authorstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_follows, migrations.RunPython.noop
+        ),
+    ]
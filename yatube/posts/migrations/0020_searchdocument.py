@@ -0,0 +1,102 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+FTS_TABLE = 'posts_searchdocument_fts'
+
+SQLITE_INDEX = [
+    f'''CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        text, content='posts_searchdocument', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )''',
+    f'''CREATE TRIGGER posts_searchdocument_ai
+        AFTER INSERT ON posts_searchdocument BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END''',
+    f'''CREATE TRIGGER posts_searchdocument_ad
+        AFTER DELETE ON posts_searchdocument BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END''',
+    f'''CREATE TRIGGER posts_searchdocument_au
+        AFTER UPDATE ON posts_searchdocument BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END''',
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS posts_searchdocument_ai',
+    'DROP TRIGGER IF EXISTS posts_searchdocument_ad',
+    'DROP TRIGGER IF EXISTS posts_searchdocument_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX posts_searchdocument_text_gin '
+            'ON posts_searchdocument USING GIN '
+            "(to_tsvector(%s::regconfig, text))",
+            params=[settings.SEARCH_CONFIG],
+        )
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA compile_options')
+            options = {row[0] for row in cursor.fetchall()}
+        if 'ENABLE_FTS5' not in options:
+            return
+        for statement in SQLITE_INDEX:
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'DROP INDEX IF EXISTS posts_searchdocument_text_gin'
+        )
+    elif connection.vendor == 'sqlite':
+        for statement in SQLITE_DROP:
+            schema_editor.execute(statement)
+
+
+def fill_documents(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    SearchDocument = apps.get_model('posts', 'SearchDocument')
+    SearchDocument.objects.bulk_create(
+        (SearchDocument(post_id=pk, text=text) for pk, text in
+         Post.objects.values_list('pk', 'text').iterator()),
+    )
+    SearchDocument.objects.bulk_create(
+        (SearchDocument(post_id=post_id, comment_id=pk, text=text)
+         for pk, post_id, text in
+         Comment.objects.values_list('pk', 'post_id', 'text').iterator()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_follow_constraints_and_post_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField()),
+                ('comment', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Comment')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Post')),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(fill_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:40
+
+from django.db import migrations, models
+
+
+def fill_updated_at(apps, schema_editor):
+    for name in ('Post', 'Comment'):
+        model = apps.get_model('posts', name)
+        model.objects.update(updated_at=models.F('pub_date'))
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_searchdocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.RunPython(fill_updated_at, migrations.RunPython.noop),
+    ]
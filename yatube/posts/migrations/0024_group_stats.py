@@ -0,0 +1,40 @@
+# Generated by Django 2.2.16 on 2026-10-17 05:14
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_stats(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.filter(group=models.OuterRef('pk')).order_by()
+    Group.objects.update(
+        posts_count=Coalesce(models.Subquery(
+            posts.values('group')
+            .annotate(total=models.Count('pk')).values('total')
+        ), 0),
+        last_post_at=models.Subquery(
+            posts.order_by('-pub_date').values('pub_date')[:1]
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_trendingscore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='last_post_at',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Последний пост'),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Постов'),
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 2.2.16 on 2026-10-17 05:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0024_group_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingState',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('decayed_at', models.DateTimeField(verbose_name='Последнее затухание')),
+            ],
+            options={
+                'verbose_name': 'состояние рейтинга',
+                'verbose_name_plural': 'состояние рейтинга',
+            },
+        ),
+    ]
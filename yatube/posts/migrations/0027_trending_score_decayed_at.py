@@ -0,0 +1,34 @@
+# Generated by Django 2.2.16 on 2026-10-17 05:52
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def copy_decayed_at(apps, schema_editor):
+    """Рейтинги приведены к моменту последнего общего затухания."""
+    TrendingState = apps.get_model('posts', 'TrendingState')
+    TrendingScore = apps.get_model('posts', 'TrendingScore')
+    decayed_at = TrendingState.objects.filter(pk=1).values_list(
+        'decayed_at', flat=True
+    ).first()
+    if decayed_at is not None:
+        TrendingScore.objects.update(decayed_at=decayed_at)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0026_authorstats_feed_pulled'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trendingscore',
+            name='decayed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Рейтинг на момент'),
+        ),
+        migrations.RunPython(copy_decayed_at, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='TrendingState',
+        ),
+    ]
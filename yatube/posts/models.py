@@ -1,6 +1,7 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
 
 from core.models import CreatedModel
 User = get_user_model()
@@ -10,6 +11,13 @@ class Group(models.Model):
     title = models.CharField(max_length=200, verbose_name='Название группы')
     slug = models.SlugField(max_length=50, unique=True, verbose_name='Адрес')
     description = models.TextField(verbose_name='Описание группы')
+    # Денормализованная статистика для каталога групп, её ведут сигналы.
+    posts_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Постов'
+    )
+    last_post_at = models.DateTimeField(
+        null=True, editable=False, verbose_name='Последний пост'
+    )
 
     class Meta:
         verbose_name = 'сообщество'
@@ -51,6 +59,10 @@ class Post(CreatedModel):
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(fields=['author', '-pub_date']),
+            models.Index(fields=['group', '-pub_date']),
+        ]
 
     def __str__(self):
         return self.text[:settings.POST_TITLE_SHOW_LENGTH]
@@ -74,6 +86,9 @@ class Comment(CreatedModel):
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(fields=['post', '-pub_date']),
+        ]
 
     def __str__(self):
         return self.text
@@ -90,3 +105,111 @@ class Follow(models.Model):
         related_name='following',
         on_delete=models.CASCADE,
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_follow',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['author', 'user']),
+        ]
+
+
+class FeedEntry(models.Model):
+    """Материализованная лента подписок: запись на каждый пост автора
+    для каждого подписчика."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-pub_date']),
+            models.Index(fields=['user', 'author']),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Счётчики автора, которые поддерживают сигналы постов и подписок."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+    # Посты автора читаются в ленте без разноса (см. posts/feed.py).
+    feed_pulled = models.BooleanField('Лента без разноса', default=False)
+
+    class Meta:
+        verbose_name = 'статистика автора'
+        verbose_name_plural = 'статистика авторов'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class TrendingScore(models.Model):
+    """Затухающий со временем рейтинг поста для вкладки «Популярное».
+
+    score - рейтинг на момент decayed_at. Комментарии и подписки на автора
+    сначала приводят его к текущему моменту, потом прибавляют вес, а
+    команда decay_trending периодически приводит все строки и удаляет
+    ставшие ничтожными.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending',
+    )
+    score = models.FloatField('Рейтинг', default=0)
+    decayed_at = models.DateTimeField(
+        'Рейтинг на момент', default=timezone.now
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score']),
+        ]
+
+
+class SearchDocument(models.Model):
+    """Текст поста или комментария для полнотекстового индекса.
+
+    Сам индекс строится средствами БД (см. posts/search.py): GIN по
+    to_tsvector в PostgreSQL или таблица FTS5 в SQLite.
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    comment = models.OneToOneField(
+        Comment,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+    text = models.TextField()
@@ -0,0 +1,109 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+Каждый пост и комментарий хранится строкой SearchDocument, которую
+обновляют сигналы. Индекс строит сама БД: в PostgreSQL это GIN по
+to_tsvector(SEARCH_CONFIG, text), в SQLite - таблица FTS5 с триггерами.
+На других БД поиск работает через LIKE без индекса.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Post, SearchDocument
+
+FTS_TABLE = 'posts_searchdocument_fts'
+
+_fts5_available = {}
+
+
+def _terms(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def has_fts5():
+    if connection.alias not in _fts5_available:
+        _fts5_available[connection.alias] = (
+            FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts5_available[connection.alias]
+
+
+def _postgresql_ids(query, limit):
+    sql = f'''
+        SELECT d.post_id
+        FROM {SearchDocument._meta.db_table} d,
+             plainto_tsquery(%s::regconfig, %s) q
+        WHERE to_tsvector(%s::regconfig, d.text) @@ q
+        GROUP BY d.post_id
+        ORDER BY MAX(ts_rank(to_tsvector(%s::regconfig, d.text), q)) DESC
+        LIMIT %s
+    '''
+    config = settings.SEARCH_CONFIG
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [config, query, config, config, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _sqlite_ids(query, limit):
+    match = ' '.join(f'"{term}"*' for term in _terms(query))
+    sql = f'''
+        SELECT d.post_id
+        FROM {FTS_TABLE} f
+        JOIN {SearchDocument._meta.db_table} d ON d.id = f.rowid
+        WHERE {FTS_TABLE} MATCH %s
+        GROUP BY d.post_id
+        ORDER BY MIN(f.rank)
+        LIMIT %s
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _fallback_ids(query, limit):
+    documents = SearchDocument.objects.all()
+    for term in _terms(query):
+        documents = documents.filter(text__icontains=term)
+    return list(
+        documents.order_by('-post_id')
+        .values_list('post_id', flat=True)
+        .distinct()[:limit]
+    )
+
+
+def search_post_ids(query, limit=None):
+    """id постов по убыванию релевантности, не больше SEARCH_MAX_RESULTS."""
+    if not _terms(query):
+        return []
+    limit = limit or settings.SEARCH_MAX_RESULTS
+    if connection.vendor == 'postgresql':
+        return _postgresql_ids(query, limit)
+    if connection.vendor == 'sqlite' and has_fts5():
+        return _sqlite_ids(query, limit)
+    return _fallback_ids(query, limit)
+
+
+def load_posts(post_ids):
+    """Посты страницы результатов в порядке релевантности."""
+    posts = (Post.objects.select_related('author', 'group')
+             .in_bulk(post_ids))
+    return [posts[pk] for pk in post_ids if pk in posts]
+
+
+def index_post(post):
+    updated = SearchDocument.objects.filter(
+        post=post, comment__isnull=True
+    ).update(text=post.text)
+    if not updated:
+        SearchDocument.objects.create(post=post, text=post.text)
+
+
+def index_comment(comment):
+    updated = SearchDocument.objects.filter(
+        comment=comment
+    ).update(text=comment.text)
+    if not updated:
+        SearchDocument.objects.create(
+            post_id=comment.post_id, comment=comment, text=comment.text
+        )
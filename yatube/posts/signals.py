@@ -0,0 +1,149 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cache, feed, search, stats, thumbnails, trending
+from .models import Comment, Follow, Group, Post, User
+
+
+# Счётчики обновляются первыми: лента читает их при разносе постов.
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, **kwargs):
+    if created:
+        stats.change_counters(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    stats.change_counters(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, **kwargs):
+    if created:
+        stats.change_counters(instance.author_id, followers_count=1)
+        stats.change_counters(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    stats.change_counters(instance.author_id, followers_count=-1)
+    stats.change_counters(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, **kwargs):
+    if created:
+        feed.fan_out_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed_on_follow(sender, instance, created, **kwargs):
+    if created:
+        feed.follow(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_feed_on_unfollow(sender, instance, **kwargs):
+    feed.trim_feed(instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_group(sender, instance, **kwargs):
+    instance._previous_group_id = None
+    if instance.pk is not None:
+        instance._previous_group_id = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Post)
+def count_group_post(sender, instance, **kwargs):
+    # Срабатывает и на перенос поста в PostEditView или в списке админки.
+    previous = getattr(instance, '_previous_group_id', None)
+    if previous == instance.group_id:
+        return
+    if previous is not None:
+        stats.change_group_stats(previous, -1)
+    if instance.group_id is not None:
+        stats.change_group_stats(instance.group_id, 1, instance.pub_date)
+    cache.bump(cache.GROUPS_SCOPE)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_group_post(sender, instance, **kwargs):
+    if instance.group_id is not None:
+        stats.change_group_stats(instance.group_id, -1)
+        cache.bump(cache.GROUPS_SCOPE)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_pages(sender, instance, **kwargs):
+    cache.bump(cache.GROUPS_SCOPE, cache.group_scope(instance.pk))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    scopes = {
+        cache.POSTS_SCOPE,
+        cache.TRENDING_SCOPE,
+        cache.profile_scope(instance.author_id),
+        cache.post_scope(instance.pk),
+    }
+    for group_id in (instance.group_id,
+                     getattr(instance, '_previous_group_id', None)):
+        if group_id is not None:
+            scopes.add(cache.group_scope(group_id))
+    cache.bump(*scopes)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_pages(sender, instance, update_fields=None, **kwargs):
+    # Вход меняет только last_login, на страницах его нет.
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    cache.bump(cache.author_scope(instance.pk))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_post_comments(sender, instance, **kwargs):
+    cache.bump(cache.post_scope(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_pages(sender, instance, **kwargs):
+    cache.bump(cache.follow_scope(instance.user_id))
+
+
+@receiver(post_save, sender=Post)
+def generate_post_thumbnail(sender, instance, **kwargs):
+    thumbnails.schedule_thumbnail(instance.image, instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def index_post_text(sender, instance, **kwargs):
+    search.index_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment_text(sender, instance, **kwargs):
+    search.index_comment(instance)
+
+
+@receiver(post_save, sender=Comment)
+def score_new_comment(sender, instance, created, **kwargs):
+    if created:
+        trending.add_score(
+            instance.post_id, settings.TRENDING_COMMENT_WEIGHT
+        )
+
+
+@receiver(post_save, sender=Follow)
+def score_new_follow(sender, instance, created, **kwargs):
+    if created:
+        trending.credit_follow(instance.author_id)
@@ -0,0 +1,92 @@
+"""Денормализованные счётчики авторов и статистика групп."""
+from django.db import connection
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import AuthorStats, Follow, Group, Post, User
+
+
+def change_counters(user_id, **deltas):
+    """Атомарно сдвигает счётчики пользователя на переданные дельты."""
+    # Greatest не даёт уйти в минус, если счётчики уже разошлись с данными.
+    updates = {field: Greatest(F(field) + delta, 0)
+               for field, delta in deltas.items()}
+    if AuthorStats.objects.filter(user_id=user_id).update(**updates):
+        return
+    AuthorStats.objects.get_or_create(user_id=user_id)
+    AuthorStats.objects.filter(user_id=user_id).update(**updates)
+
+
+def _count(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    ), 0)
+
+
+def actual_counters():
+    """Счётчики, посчитанные заново по таблицам постов и подписок."""
+    return (
+        User.objects.order_by('pk')
+        .annotate(
+            posts_count=_count(Post.objects, 'author'),
+            followers_count=_count(Follow.objects, 'author'),
+            following_count=_count(Follow.objects, 'user'),
+        )
+        .values_list('pk', 'posts_count', 'followers_count',
+                     'following_count')
+    )
+
+
+def _last_post_at():
+    return Subquery(
+        Post.objects.filter(group=OuterRef('pk'))
+        .order_by('-pub_date').values('pub_date')[:1]
+    )
+
+
+def change_group_stats(group_id, delta, pub_date=None):
+    """Сдвигает число постов группы на delta одним UPDATE.
+
+    Новый пост группы (pub_date) может только сдвинуть время последнего
+    поста вперёд; после удаления или переноса поста оно перечитывается
+    по индексу (group, -pub_date).
+    """
+    if pub_date is None:
+        last_post_at = _last_post_at()
+    else:
+        # Coalesce: в SQLite MAX(NULL, x) - это NULL.
+        last_post_at = Greatest(
+            Coalesce('last_post_at', Value(pub_date)), Value(pub_date)
+        )
+    Group.objects.filter(pk=group_id).update(
+        posts_count=Greatest(F('posts_count') + delta, 0),
+        last_post_at=last_post_at,
+    )
+
+
+def refresh_group_stats():
+    """Пересчитывает статистику всех групп; возвращает число групп."""
+    return Group.objects.update(
+        posts_count=_count(Post.objects, 'group'),
+        last_post_at=_last_post_at(),
+    )
+
+
+def estimated_count(model):
+    """Оценка числа строк по статистике PostgreSQL или None."""
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+            [model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    # До первого ANALYZE reltuples равен 0 или -1.
+    if row is None or row[0] <= 0:
+        return None
+    return int(row[0])
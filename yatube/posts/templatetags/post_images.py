@@ -0,0 +1,30 @@
+from django import template
+
+from posts.thumbnails import (
+    get_cached_thumbnail,
+    get_cached_variants,
+    schedule_thumbnail,
+)
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(post):
+    """Готовая миниатюра картинки поста или None.
+
+    Отсутствующая миниатюра ставится в очередь фоновой генерации.
+    """
+    thumbnail = get_cached_thumbnail(post.image)
+    if thumbnail is None:
+        schedule_thumbnail(post.image, post.pk)
+    return thumbnail
+
+
+@register.simple_tag
+def post_srcset(post):
+    """Значение srcset из готовых вариантов миниатюры или пустая строка."""
+    return ', '.join(
+        f'{thumbnail.url} {width}w'
+        for thumbnail, width in get_cached_variants(post.image)
+    )
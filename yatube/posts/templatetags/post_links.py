@@ -0,0 +1,37 @@
+"""Кэш адресов постов, профилей и групп для шаблонов лент.
+
+post.html включается на каждый пост страницы, и {% url %} каждый раз
+проходит резолвер заново. Адрес зависит только от имени маршрута,
+аргументов и префикса скрипта, поэтому {% cached_url %} запоминает его
+в LRU-кэше процесса; кэш сбрасывается при смене ROOT_URLCONF.
+"""
+from functools import lru_cache
+
+from django import template
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.urls import get_script_prefix, reverse
+
+register = template.Library()
+
+
+@lru_cache(maxsize=settings.TEMPLATE_URL_CACHE_SIZE)
+def _reverse(viewname, args, script_prefix):
+    return reverse(viewname, args=args)
+
+
+def cached_reverse(viewname, *args):
+    return _reverse(viewname, args, get_script_prefix())
+
+
+@receiver(setting_changed)
+def clear_url_cache(setting, **kwargs):
+    if setting == 'ROOT_URLCONF':
+        _reverse.cache_clear()
+
+
+@register.simple_tag
+def cached_url(viewname, *args):
+    """Как {% url %} с позиционными аргументами, но без резолвера."""
+    return cached_reverse(viewname, *args)
@@ -0,0 +1,110 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(text=f'Пост {i}', author=cls.author,
+                                group=cls.group)
+            for i in range(13)
+        ]
+        cls.posts[-1].comments.create(author=cls.reader, text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def test_lists_walk_all_posts_by_cursor(self):
+        """Курсор обходит ленты от новых постов к старым без пропусков."""
+        self.client.force_login(self.reader)
+        expected = [post.pk for post in reversed(self.posts)]
+        urls = (
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', args=(self.group.slug,)),
+            reverse('posts:api_profile', args=(self.author.username,)),
+            reverse('posts:api_follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                second = self.client.get(
+                    url, {'cursor': data['next_cursor']}
+                ).json()
+                results = data['results'] + second['results']
+                self.assertEqual([post['id'] for post in results], expected)
+                self.assertIsNone(second['next_cursor'])
+                self.assertEqual(data['results'][0]['author'], 'author')
+
+    def test_sparse_fields(self):
+        """fields= оставляет в ответе и в SELECT только нужные поля."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('posts:api_index'), {'fields': 'id,text'}
+            )
+        self.assertEqual(
+            set(response.json()['results'][0]), {'id', 'text'}
+        )
+        sql = queries.captured_queries[-1]['sql']
+        self.assertNotIn('auth_user', sql)
+        self.assertNotIn('"group_id"', sql)
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get(
+            reverse('posts:api_index'), {'fields': 'id,password'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('password', response.json()['error'])
+
+    def test_post_detail_with_comments(self):
+        post = self.posts[-1]
+        data = self.client.get(
+            reverse('posts:api_post_detail', args=(post.pk,))
+        ).json()
+        self.assertEqual(data['text'], post.text)
+        self.assertEqual(data['group'], self.group.slug)
+        self.assertEqual(data['url'], reverse('posts:post_detail',
+                                              args=(post.pk,)))
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']['results']],
+            ['Комментарий'],
+        )
+
+    def test_etag_and_errors(self):
+        """Неизменённый ответ - 304, ошибки отдаются JSON."""
+        url = reverse('posts:api_index')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.create(text='Новый пост', author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        cases = (
+            (reverse('posts:api_follow_index'), HTTPStatus.UNAUTHORIZED),
+            (reverse('posts:api_post_detail', args=(0,)),
+             HTTPStatus.NOT_FOUND),
+            (url + '?cursor=broken', HTTPStatus.BAD_REQUEST),
+        )
+        for url, status in cases:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('error', response.json())
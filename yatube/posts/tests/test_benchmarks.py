@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from .. import benchmarks
+from ..management.commands import benchmark_routes
+from ..models import AuthorStats, Comment, Follow, Post, User
+
+
+class BenchmarksTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        benchmarks.seed(users=5, groups=2, posts=30, comments=40, follows=6)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_seed_creates_requested_volumes(self):
+        """seed() создаёт данные и пересчитывает счётчики авторов."""
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertEqual(Follow.objects.count(), 6)
+        self.assertEqual(
+            sum(AuthorStats.objects.values_list('posts_count', flat=True)),
+            30,
+        )
+
+    def test_measure_queries_covers_all_routes(self):
+        """Для каждого маршрута посчитано число SQL-запросов."""
+        urls = benchmarks.route_urls()
+        self.assertEqual(set(urls), set(benchmarks.ROUTES))
+        user = Follow.objects.first().user
+        report = benchmarks.measure_queries(user, urls)
+        for name in benchmarks.ROUTES:
+            with self.subTest(route=name):
+                self.assertGreater(report[name]['queries'], 0)
+
+    def test_compare_reports(self):
+        """Рост запросов, ошибок и p95 сверх порога считается регрессией."""
+        baseline = {'routes': {
+            'index_page': {'queries': 2, 'p95_ms': 10.0, 'errors': 0},
+        }}
+        same = {'routes': {
+            'index_page': {'queries': 2, 'p95_ms': 12.0, 'errors': 0},
+        }}
+        worse = {'routes': {
+            'index_page': {'queries': 3, 'p95_ms': 20.0, 'errors': 1},
+        }}
+        self.assertEqual(benchmarks.compare_reports(baseline, same), [])
+        self.assertEqual(len(benchmarks.compare_reports(baseline, worse)), 3)
+
+    def test_benchmark_does_not_touch_site_cache(self):
+        """Замер пишет в свой кэш, а не в общий кэш сайта."""
+        cache.set('benchmark-test', 'сайт')
+        seen = []
+
+        def seed(**kwargs):
+            seen.append(cache.get('benchmark-test'))
+            cache.clear()
+            raise RuntimeError
+
+        options = {'compare_pooling': False, 'users': 1, 'groups': 1,
+                   'posts': 1, 'comments': 1, 'follows': 1}
+        with mock.patch.object(benchmarks, 'seed', seed):
+            with self.assertRaises(RuntimeError):
+                benchmark_routes.Command().run_benchmark(options)
+        self.assertEqual(seen, [None])
+        self.assertEqual(cache.get('benchmark-test'), 'сайт')
+
+    def test_compare_pooling_needs_real_database(self):
+        """На in-memory SQLite сравнение с пулом и без него отклоняется."""
+        with self.assertRaises(CommandError):
+            benchmark_routes.Command().run_benchmark({'compare_pooling': True})
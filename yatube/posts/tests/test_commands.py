@@ -0,0 +1,178 @@
+import json
+import os
+import shutil
+import tempfile
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import transfer
+from ..models import AuthorStats, Comment, FeedEntry, Follow, Group, Post
+
+User = get_user_model()
+
+
+class AuthorStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_counters_follow_posts_and_subscriptions(self):
+        """Счётчики меняются при создании и удалении постов и подписок."""
+        post = Post.objects.create(text='Тестовый пост', author=self.author)
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=(self.author.username,))
+        )
+        self.assertEqual(self.author.stats.posts_count, 1)
+        self.assertEqual(self.author.stats.followers_count, 1)
+        self.assertEqual(self.reader.stats.following_count, 1)
+        post.delete()
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=(self.author.username,))
+        )
+        self.author.stats.refresh_from_db()
+        self.reader.stats.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 0)
+        self.assertEqual(self.author.stats.followers_count, 0)
+        self.assertEqual(self.reader.stats.following_count, 0)
+
+    def test_rebuild_author_stats_fixes_drift(self):
+        """Команда rebuild_author_stats пересчитывает счётчики с нуля."""
+        Post.objects.bulk_create(
+            Post(text='Тестовый пост', author=self.author) for _ in range(3)
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        AuthorStats.objects.filter(user=self.reader).delete()
+        out = StringIO()
+        call_command('rebuild_author_stats', '--check', stdout=out)
+        self.assertIn('1', out.getvalue())
+        call_command('rebuild_author_stats', stdout=StringIO())
+        author_stats = AuthorStats.objects.get(user=self.author)
+        self.assertEqual(author_stats.posts_count, 3)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.reader).following_count, 1
+        )
+
+    def test_fill_stats_migration_handles_many_users(self):
+        """Миграция не упирается в лимит составного INSERT в SQLite."""
+        User.objects.bulk_create(
+            User(username=f'user{i}') for i in range(600)
+        )
+        AuthorStats.objects.all().delete()
+        migration = import_module('posts.migrations.0017_authorstats')
+        migration.fill_stats(apps, None)
+        self.assertEqual(AuthorStats.objects.count(), User.objects.count())
+
+
+class ContentTransferTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.author = User.objects.create_superuser(
+            username='author', email='author@example.com', password='secret'
+        )
+        self.author.last_login = self.author.date_joined
+        self.author.save(update_fields=['last_login'])
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.posts = [
+            Post.objects.create(
+                text=f'Пост {i},\nс переносом', author=self.author,
+                group=self.group if i % 2 else None,
+                image='posts/cat.jpg' if i == 0 else '',
+            )
+            for i in range(3)
+        ]
+        Comment.objects.create(
+            post=self.posts[0], author=self.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def snapshot(self):
+        return {
+            'users': list(User.objects.order_by('pk').values_list(
+                'pk', 'username', 'password', 'is_staff', 'is_superuser',
+                'last_login', 'date_joined'
+            )),
+            'groups': list(Group.objects.values_list('pk', 'slug')),
+            'posts': list(Post.objects.order_by('pk').values_list(
+                'pk', 'text', 'author_id', 'group_id', 'image', 'pub_date'
+            )),
+            'comments': list(Comment.objects.values_list(
+                'pk', 'post_id', 'author_id', 'text', 'pub_date'
+            )),
+            'follows': list(Follow.objects.values_list(
+                'user_id', 'author_id'
+            )),
+        }
+
+    def test_round_trip(self):
+        """Выгрузка и загрузка сохраняют связи, даты и картинки."""
+        for file_format in transfer.FORMATS:
+            with self.subTest(format=file_format):
+                expected = self.snapshot()
+                call_command('export_content', self.directory,
+                             '--format', file_format, '--chunk-size', '2',
+                             stdout=StringIO())
+                User.objects.all().delete()
+                Group.objects.all().delete()
+                call_command('import_content', self.directory,
+                             '--format', file_format, '--batch-size', '2',
+                             stdout=StringIO())
+                self.assertEqual(self.snapshot(), expected)
+                self.assertEqual(self.author.stats.posts_count, 3)
+                self.assertEqual(
+                    FeedEntry.objects.filter(user=self.reader).count(), 3
+                )
+
+    def test_export_resume_appends_new_rows(self):
+        call_command('export_content', self.directory, stdout=StringIO())
+        Post.objects.create(text='Новый пост', author=self.author)
+        call_command('export_content', self.directory, '--resume',
+                     stdout=StringIO())
+        path = transfer.dump_path(self.directory, 'posts', 'jsonl')
+        with open(path) as file:
+            ids = [json.loads(line)['id'] for line in file]
+        self.assertEqual(
+            ids, sorted(Post.objects.values_list('pk', flat=True))
+        )
+
+    def test_import_resume_skips_loaded_rows(self):
+        """С --resume строки до сохранённого прогресса не загружаются."""
+        call_command('export_content', self.directory, stdout=StringIO())
+        Post.objects.all().delete()
+        transfer.write_state(
+            os.path.join(self.directory, transfer.IMPORT_STATE),
+            {'format': 'jsonl', 'users': 2, 'groups': 1, 'posts': 1,
+             'comments': 1, 'follows': 1},
+        )
+        call_command('import_content', self.directory, '--resume',
+                     stdout=StringIO())
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list('pk', flat=True)),
+            [post.pk for post in self.posts[1:]],
+        )
+
+
+class TemplateBenchmarkTest(TestCase):
+    def test_reports_each_mode_and_size(self):
+        out = StringIO()
+        call_command('benchmark_templates', '--sizes', '2', '5',
+                     '--repeat', '1', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(all('мкс/пост' in line for line in lines))
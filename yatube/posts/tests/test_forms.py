@@ -1,17 +1,20 @@
 
 import tempfile
 import shutil
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from http import HTTPStatus
 
 from ..models import Comment, Group, Post
 from ..forms import CommentForm, PostForm
+from ..images import normalize_image
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -265,3 +268,47 @@ class CommentFormTests(TestCase):
                 post=self.post,
             ).exists()
         )
+
+
+class ImageNormalizationTest(TestCase):
+    def upload(self, image, image_format, name, **options):
+        buffer = BytesIO()
+        image.save(buffer, image_format, **options)
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+    def open(self, uploaded):
+        uploaded.seek(0)
+        return Image.open(uploaded)
+
+    @override_settings(IMAGE_MAX_SIDE=500)
+    def test_large_image_is_capped_and_reencoded(self):
+        """Метаданные убраны, размер ограничен, формат пересохранён."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        uploaded = self.upload(
+            Image.new('RGB', (1500, 600), 'red'), 'PNG', 'shot.png',
+            exif=exif.tobytes(),
+        )
+        result = self.open(normalize_image(uploaded))
+        self.assertEqual(result.size, (500, 200))
+        self.assertIn(result.format, ('JPEG', 'WEBP'))
+        self.assertFalse(result.getexif())
+
+    def test_transparency_is_kept(self):
+        uploaded = self.upload(
+            Image.new('RGBA', (20, 20), (255, 0, 0, 0)), 'PNG', 'alpha.png'
+        )
+        result = self.open(normalize_image(uploaded))
+        self.assertIn(result.format, ('PNG', 'WEBP'))
+        self.assertEqual(result.mode, 'RGBA')
+
+    def test_opaque_rgba_becomes_rgb(self):
+        uploaded = self.upload(
+            Image.new('RGBA', (20, 20), (255, 0, 0, 255)), 'PNG', 'flat.png'
+        )
+        result = self.open(normalize_image(uploaded))
+        self.assertEqual(result.mode, 'RGB')
+
+    def test_gif_is_left_unchanged(self):
+        uploaded = self.upload(Image.new('P', (2, 2)), 'GIF', 'anim.gif')
+        self.assertIs(normalize_image(uploaded), uploaded)
@@ -1,8 +1,9 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError
 from django.test import TestCase
 
-from ..models import Comment, Group, Post
+from ..models import Comment, Follow, Group, Post
 
 User = get_user_model()
 
@@ -122,3 +123,17 @@ class CommentTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     comment._meta.get_field(field).help_text, expected_value)
+
+
+class FollowModelTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='follower')
+        cls.author = User.objects.create_user(username='author')
+
+    def test_follow_is_unique(self):
+        """Повторная подписка на того же автора запрещена на уровне БД."""
+        Follow.objects.create(user=self.user, author=self.author)
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(user=self.user, author=self.author)
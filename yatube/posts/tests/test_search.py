@@ -0,0 +1,90 @@
+from http import HTTPStatus
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Post, SearchDocument
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.cats = Post.objects.create(
+            text='Кошки любят спать на солнце',
+            author=cls.user,
+        )
+        cls.dogs = Post.objects.create(
+            text='Собаки любят гулять',
+            author=cls.user,
+        )
+        cls.dogs.comments.create(author=cls.user, text='А кошки нет')
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def search(self, query, url='posts:search'):
+        return self.client.get(reverse(url), {'q': query})
+
+    def test_search_finds_posts_and_comments(self):
+        """Поиск находит посты по тексту поста и его комментариев."""
+        response = self.search('кошки')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            set(response.context['page_obj']), {self.cats, self.dogs}
+        )
+        self.assertEqual(
+            list(self.search('гулять').context['page_obj']), [self.dogs]
+        )
+
+    def test_search_index_follows_edits(self):
+        """Индекс обновляется при правке поста."""
+        self.cats.text = 'Теперь про попугаев'
+        self.cats.save()
+        self.assertEqual(
+            list(self.search('попугаев').context['page_obj']), [self.cats]
+        )
+        self.assertNotIn(self.cats, self.search('солнце').context['page_obj'])
+
+    def test_search_api_returns_json(self):
+        response = self.search('собаки', url='posts:search_api')
+        data = response.json()
+        self.assertEqual(data['query'], 'собаки')
+        self.assertEqual([post['id'] for post in data['results']],
+                         [self.dogs.pk])
+
+    def test_empty_query_returns_nothing(self):
+        self.assertEqual(len(self.search('').context['page_obj']), 0)
+
+    def test_rebuild_search_index(self):
+        SearchDocument.objects.all().delete()
+        self.assertEqual(len(self.search('кошки').context['page_obj']), 0)
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('кошки').context['page_obj']), 2)
+
+    def test_fill_documents_migration_handles_many_rows(self):
+        """Миграция не упирается в лимит составного INSERT в SQLite."""
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=self.user) for i in range(600)
+        )
+        Comment.objects.bulk_create(
+            Comment(post=self.cats, author=self.user, text=f'Ответ {i}')
+            for i in range(600)
+        )
+        SearchDocument.objects.all().delete()
+        migration = import_module('posts.migrations.0020_searchdocument')
+        migration.fill_documents(apps, None)
+        self.assertEqual(
+            SearchDocument.objects.count(),
+            Post.objects.count() + Comment.objects.count(),
+        )
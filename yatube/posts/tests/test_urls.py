@@ -35,6 +35,7 @@ class PostURLTests(TestCase):
         """Проверка шаблонов urls приложения posts."""
         templates_url_names = {
             'posts/index.html': '/',
+            'posts/group_index.html': '/group/',
             'posts/group_list.html': '/group/test-slug/',
             'posts/post_detail.html': '/posts/1/',
             'posts/profile.html': '/profile/auth/',
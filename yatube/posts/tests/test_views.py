@@ -1,16 +1,36 @@
 from http import HTTPStatus
+from io import BytesIO, StringIO
+import json
 import tempfile
 import shutil
+import zipfile
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
+from PIL import Image
 
-from posts.models import Follow, Group, Post
+from core.pagination import CursorPaginator
+from posts.models import (
+    Comment, FeedEntry, Follow, Group, Post, TrendingScore,
+)
+from posts import stats, trending
+from posts.cache import bump, get_versions, post_scope
+from posts.feed import get_feed, is_pulled_author
+from posts.templatetags import post_links
+from posts.thumbnails import (
+    generate_thumbnail,
+    get_cached_thumbnail,
+    get_cached_variants,
+)
 
 User = get_user_model()
 
@@ -157,6 +177,76 @@ class PostPagesTests(BaseTest):
         self.assertEqual(post.group, self.post.group)
 
 
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTest(BaseTest):
+    def setUp(self):
+        self.client = Client()
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        self.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=self.user,
+            image=SimpleUploadedFile(
+                name='thumb.gif',
+                content=small_gif,
+                content_type='image/gif',
+            ),
+        )
+        cache.clear()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_page_shows_original_until_thumbnail_exists(self):
+        """Страница не обрабатывает картинки и отдаёт оригинал,
+        пока фоновая миниатюра не готова."""
+        with mock.patch('sorl.thumbnail.default.engine') as engine:
+            response = self.client.get(reverse('posts:index_page'))
+        engine.get_image.assert_not_called()
+        self.assertContains(response, self.post.image.url)
+
+        generate_thumbnail(self.post.image.name, self.post.pk)
+        thumbnail = get_cached_thumbnail(self.post.image)
+        self.assertIsNotNone(thumbnail)
+        cache.clear()
+        response = self.client.get(reverse('posts:index_page'))
+        self.assertContains(response, thumbnail.url)
+
+    def test_failed_generation_keeps_post_version(self):
+        """Неудачная генерация не сбрасывает кэш страницы поста."""
+        scope = post_scope(self.post.pk)
+        version = get_versions([scope])[scope]
+        with self.assertLogs('posts.thumbnails', 'ERROR'):
+            generate_thumbnail('posts/missing.jpg', self.post.pk)
+        self.assertEqual(get_versions([scope])[scope], version)
+
+    def test_variants_build_srcset(self):
+        """Для широкой картинки создаются варианты ширин для srcset."""
+        buffer = BytesIO()
+        Image.new('RGB', (1000, 400), 'blue').save(buffer, 'JPEG')
+        post = Post.objects.create(
+            text='Широкая картинка',
+            author=self.user,
+            image=SimpleUploadedFile('wide.jpg', buffer.getvalue()),
+        )
+        generate_thumbnail(post.image.name, post.pk)
+        widths = [width for _, width in get_cached_variants(post.image)]
+        self.assertEqual(widths, [480, 960])
+        cache.clear()
+        response = self.client.get(reverse('posts:index_page'))
+        self.assertContains(response, 'srcset=')
+        self.assertContains(response, ' 480w, ')
+        self.assertContains(response, 'loading="lazy"')
+
+
 class PaginatorViewsTest(BaseTest):
     @classmethod
     def setUpClass(cls):
@@ -202,6 +292,76 @@ class PaginatorViewsTest(BaseTest):
                 )
 
 
+class CursorPaginatorViewsTest(BaseTest):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        Post.objects.bulk_create(
+            Post(text=f'Тестовый текст №{i+1}', author=cls.user,
+                 group=cls.group)
+            for i in range(COUNT_POSTS_FOR_TEST_TO_CREATE)
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.views_to_test_paginator = [
+            reverse('posts:index_page'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        ]
+        cache.clear()
+
+    def test_cursor_pages_cover_all_posts_in_order(self):
+        """Курсоры проходят все Post по (pub_date, id) без повторов."""
+        expected = list(
+            Post.objects.order_by('-pub_date', '-pk')
+            .values_list('pk', flat=True)
+        )
+        for view in self.views_to_test_paginator:
+            with self.subTest(view=view):
+                response = self.client.get(view, {'cursor': ''})
+                first_page = response.context['page_obj']
+                self.assertFalse(first_page.has_previous())
+                second_page = self.client.get(
+                    view, {'cursor': first_page.next_cursor}
+                ).context['page_obj']
+                self.assertFalse(second_page.has_next())
+                self.assertEqual(
+                    [post.pk for post in first_page]
+                    + [post.pk for post in second_page],
+                    expected,
+                )
+                back_page = self.client.get(
+                    view, {'cursor': second_page.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(
+                    [post.pk for post in back_page],
+                    [post.pk for post in first_page],
+                )
+                self.assertFalse(back_page.has_previous())
+
+    def test_cursor_page_does_not_count(self):
+        """Страница по курсору не выполняет COUNT(*)."""
+        with self.assertNumQueries(1):
+            page = CursorPaginator(
+                Post.objects.all(), settings.COUNT_OF_POSTS_PAGINATOR
+            ).page()
+            self.assertEqual(len(page), settings.COUNT_OF_POSTS_PAGINATOR)
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(
+            reverse('posts:index_page'), {'cursor': 'broken'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_paginator_template_renders_cursor_links(self):
+        response = self.client.get(reverse('posts:index_page'),
+                                   {'cursor': ''})
+        page = response.context['page_obj']
+        self.assertContains(response, f'?cursor={page.next_cursor}')
+        self.assertNotContains(response, '?page=')
+
+
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class CreatePostTest(BaseTest):
     @classmethod
@@ -317,6 +477,26 @@ class CommentTest(BaseTest):
             reverse('posts:post_detail', args=(self.post.id,)),
         )
 
+    def test_ajax_comment_returns_fragment(self):
+        """POST из скрипта получает только разметку нового комментария."""
+        response = self.authorised_client.post(
+            reverse('posts:add_comment', args=(self.post.id,)),
+            data={'text': 'Комментарий из скрипта'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertContains(response, 'Комментарий из скрипта',
+                            status_code=HTTPStatus.CREATED)
+        self.assertNotContains(response, '<html',
+                               status_code=HTTPStatus.CREATED)
+        response = self.authorised_client.post(
+            reverse('posts:add_comment', args=(self.post.id,)),
+            data={'text': ''},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('text', response.json()['errors'])
+
     def test_add_comment_by_unauthorised_client(self):
         count_comments = self.post.comments.count()
         form_data = {
@@ -336,19 +516,62 @@ class TestCachePage(BaseTest):
         cache.clear()
 
     def test_index_page_uses_cache(self):
-        first_response = self.authorised_user.get(reverse('posts:index_page'))
-        first_content = first_response.content
-        Post.objects.create(
+        """Главная отдаётся из кэша, пока версия страницы не изменилась."""
+        post = Post.objects.create(
             text='Тестовый пост',
             author=self.user,
         )
+        first_response = self.authorised_user.get(reverse('posts:index_page'))
+        Post.objects.filter(pk=post.pk).update(text='Изменено без сигналов')
         second_response = self.authorised_user.get(reverse('posts:index_page'))
-        second_content = second_response.content
-        self.assertEqual(first_content, second_content)
+        self.assertEqual(first_response.content, second_response.content)
         cache.clear()
         third_response = self.authorised_user.get(reverse('posts:index_page'))
-        third_content = third_response.content
-        self.assertNotEqual(first_content, third_content)
+        self.assertNotEqual(first_response.content, third_response.content)
+
+    def test_new_post_invalidates_cached_pages(self):
+        """Новый пост сразу виден на закэшированных страницах."""
+        urls = (
+            reverse('posts:index_page'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.user.username,)),
+        )
+        for url in urls:
+            self.authorised_user.get(url)
+        Post.objects.create(
+            text='Свежий пост',
+            author=self.user,
+            group=self.group,
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorised_user.get(url)
+                self.assertContains(response, 'Свежий пост')
+
+    def test_edit_invalidates_post_fragment(self):
+        """Правка поста обновляет его фрагмент в кэше."""
+        post = Post.objects.create(
+            text='Старый текст',
+            author=self.user,
+        )
+        self.authorised_user.get(reverse('posts:index_page'))
+        post.text = 'Новый текст'
+        post.save()
+        response = self.authorised_user.get(reverse('posts:index_page'))
+        self.assertContains(response, 'Новый текст')
+        self.assertNotContains(response, 'Старый текст')
+
+    def test_comment_invalidates_post_detail(self):
+        """Новый комментарий сразу виден на странице поста."""
+        post = Post.objects.create(
+            text='Тестовый пост',
+            author=self.user,
+        )
+        url = reverse('posts:post_detail', args=(post.pk,))
+        self.authorised_user.get(url)
+        post.comments.create(author=self.user, text='Свежий комментарий')
+        response = self.authorised_user.get(url)
+        self.assertContains(response, 'Свежий комментарий')
 
 
 class TestSubscribers(TestCase):
@@ -372,6 +595,32 @@ class TestSubscribers(TestCase):
         self.unauthorised_client = Client()
         cache.clear()
 
+    def test_ajax_follow_returns_state_and_counters(self):
+        """POST из скрипта отвечает JSON без редиректа на профиль."""
+        for url_name, following, followers in (
+            ('posts:profile_follow', True, 1),
+            ('posts:profile_unfollow', False, 0),
+        ):
+            with self.subTest(url=url_name):
+                response = self.first_test_user.post(
+                    reverse(url_name, args=(self.author.username,)),
+                    HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+                )
+                self.assertEqual(response.json(), {
+                    'following': following,
+                    'followers_count': followers,
+                    'following_count': 0,
+                })
+
+    def test_follow_form_without_script_redirects(self):
+        response = self.first_test_user.post(
+            reverse('posts:profile_follow', args=(self.author.username,))
+        )
+        self.assertRedirects(
+            response, reverse('posts:profile', args=(self.author.username,))
+        )
+        self.assertTrue(self.first_user.follower.exists())
+
     def test_authorized_user_can_follow_author(self):
         """Авторизованный пользователь может подписаться на автора."""
         response = self.first_test_user.get(
@@ -428,3 +677,592 @@ class TestSubscribers(TestCase):
             self.post,
             second_posts,
         )
+
+    def test_follow_backfills_feed(self):
+        """Подписка переносит уже опубликованные посты автора в ленту."""
+        self.first_test_user.get(
+            reverse('posts:profile_follow', args=(self.author.username,))
+        )
+        self.assertTrue(
+            FeedEntry.objects.filter(
+                user=self.first_user,
+                post=self.post,
+            ).exists()
+        )
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        """Новый пост попадает в ленту подписчиков, но не остальных."""
+        Follow.objects.create(user=self.first_user, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertTrue(
+            FeedEntry.objects.filter(
+                user=self.first_user,
+                post=new_post,
+            ).exists()
+        )
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.second_user).exists()
+        )
+
+    def test_unfollow_trims_feed(self):
+        """Отписка убирает посты автора из ленты."""
+        Follow.objects.create(user=self.first_user, author=self.author)
+        self.first_test_user.get(
+            reverse('posts:profile_unfollow', args=(self.author.username,))
+        )
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.first_user).exists()
+        )
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=0)
+    def test_popular_author_is_read_without_fan_out(self):
+        """Посты популярного автора подмешиваются в ленту при чтении."""
+        Follow.objects.create(user=self.first_user, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertFalse(FeedEntry.objects.exists())
+        response = self.first_test_user.get(reverse('posts:follow_index'))
+        posts = response.context.get('page_obj')
+        self.assertIn(self.post, posts)
+        self.assertIn(new_post, posts)
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=1,
+                       FEED_FANOUT_MIN_FOLLOWERS=0)
+    def test_author_between_thresholds_stays_pulled(self):
+        """Отписка у порога не раскладывает посты по лентам."""
+        Follow.objects.create(user=self.first_user, author=self.author)
+        second = Follow.objects.create(user=self.second_user,
+                                       author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        second.delete()
+        self.assertFalse(FeedEntry.objects.filter(post=new_post).exists())
+        self.assertTrue(is_pulled_author(self.author.pk))
+        self.assertEqual(
+            list(get_feed(self.first_user)), [new_post, self.post]
+        )
+        call_command('backfill_feeds', stdout=StringIO())
+        self.assertTrue(is_pulled_author(self.author.pk))
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=2,
+                       FEED_FANOUT_MIN_FOLLOWERS=2)
+    def test_backfill_feeds_pushes_author_in_portions(self):
+        """Команда раскладывает посты порциями и возвращает разнос."""
+        third_user = User.objects.create_user(username='third')
+        follows = [
+            Follow.objects.create(user=user, author=self.author)
+            for user in (self.first_user, self.second_user, third_user)
+        ]
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        follows[-1].delete()
+        call_command('backfill_feeds', '--max-rows', '1', stdout=StringIO())
+        self.assertEqual(
+            FeedEntry.objects.filter(post=new_post).count(), 1
+        )
+        self.assertTrue(is_pulled_author(self.author.pk))
+        call_command('backfill_feeds', '--max-rows', '1', stdout=StringIO())
+        self.assertFalse(is_pulled_author(self.author.pk))
+        for user in (self.first_user, self.second_user):
+            self.assertEqual(
+                list(get_feed(user)), [new_post, self.post]
+            )
+        newest = Post.objects.create(text='Свежий пост', author=self.author)
+        self.assertEqual(
+            FeedEntry.objects.filter(post=newest).count(), 2
+        )
+
+
+class PostDetailQueriesTest(BaseTest):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post = Post.objects.create(
+            text='Тестовый текст',
+            author=cls.user,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def test_post_detail_queries_do_not_grow_with_comments(self):
+        """Число запросов post_detail не зависит от числа комментариев."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        for count in (1, 30):
+            Comment.objects.bulk_create(
+                Comment(post=self.post, author=User.objects.create_user(
+                    username=f'commenter_{count}_{i}'), text='Комментарий')
+                for i in range(count)
+            )
+            cache.clear()
+            with self.subTest(comments=count):
+                with self.assertNumQueries(2):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_post_detail_paginates_comments(self):
+        """Комментарии выводятся страницами по курсору."""
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.user, text=f'Комментарий {i}')
+            for i in range(settings.COUNT_OF_COMMENTS_PAGINATOR + 1)
+        )
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        comments = self.client.get(url).context['comments']
+        self.assertEqual(len(comments), settings.COUNT_OF_COMMENTS_PAGINATOR)
+        self.assertTrue(comments.has_next())
+        next_comments = self.client.get(
+            url, {'comments_cursor': comments.next_cursor}
+        ).context['comments']
+        self.assertEqual(len(next_comments), 1)
+        self.assertEqual(
+            self.client.get(url).context['post'].author.stats.posts_count,
+            self.user.posts.count(),
+        )
+
+    def test_comments_fragment_loads_next_pages(self):
+        """Следующие страницы отдаются фрагментом одним запросом."""
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.user, text=f'Комментарий {i}')
+            for i in range(settings.COUNT_OF_COMMENTS_PAGINATOR + 1)
+        )
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        response = self.client.get(url)
+        first = response.context['comments']
+        fragment_url = reverse('posts:post_comments', args=(self.post.pk,))
+        self.assertContains(
+            response, f'{fragment_url}?comments_cursor={first.next_cursor}'
+        )
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                fragment_url, {'comments_cursor': first.next_cursor}
+            )
+        self.assertNotContains(response, '<html')
+        self.assertNotContains(response, 'Новее')
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['Комментарий 0'],
+        )
+
+
+class ConditionalGetTest(BaseTest):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post = Post.objects.create(
+            text='Тестовый текст',
+            author=cls.user,
+            group=cls.group,
+        )
+        cls.urls = (
+            reverse('posts:index_page'),
+            reverse('posts:group_list', args=(cls.group.slug,)),
+            reverse('posts:profile', args=(cls.user.username,)),
+            reverse('posts:post_detail', args=(cls.post.pk,)),
+        )
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def test_unchanged_page_returns_not_modified(self):
+        """Повторный запрос с ETag или Last-Modified получает 304."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                etag = response['ETag']
+                last_modified = response['Last-Modified']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+                response = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=last_modified
+                )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+
+    def test_edit_changes_etag(self):
+        """Правка поста меняет ETag всех страниц с ним."""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        updated_at = self.post.updated_at
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertGreater(self.post.updated_at, updated_at)
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertContains(response, 'Новый текст')
+
+    def test_post_version_changes_list_etags(self):
+        """Готовая миниатюра (версия поста) меняет ETag списков с ним."""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        bump(post_scope(self.post.pk))
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_author_edit_changes_pages(self):
+        """Новое имя автора сразу видно на всех страницах с его постом."""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        self.user.first_name, self.user.last_name = 'Лев', 'Толстой'
+        self.user.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertContains(response, 'Лев Толстой')
+
+    def test_anonymous_detail_sets_no_csrf_cookie(self):
+        response = self.client.get(self.urls[-1])
+        self.assertNotIn(settings.CSRF_COOKIE_NAME, response.cookies)
+
+    def test_etag_depends_on_viewer(self):
+        url = reverse('posts:index_page')
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_new_csrf_token_changes_form_pages(self):
+        """После повторного входа страницы с формами не отдают 304:
+        в них был бы прежний CSRF-токен."""
+        self.client.force_login(self.user)
+        for url in self.urls[2:]:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                self.client.logout()
+                self.client.force_login(self.user)
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_new_comment_changes_post_detail(self):
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(post=self.post, author=self.user, text='Ого')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+class PostsCountTest(BaseTest):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.user, group=cls.group)
+            for i in range(COUNT_POSTS_FOR_TEST_TO_CREATE)
+        )
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        return response, [
+            query['sql'] for query in context.captured_queries
+            if 'COUNT(' in query['sql']
+        ]
+
+    def test_count_is_cached_until_scope_changes(self):
+        """COUNT(*) выполняется раз на версию области группы."""
+        url = reverse('posts:group_list', args=(self.group.slug,))
+        response, counts = self.count_queries(url)
+        self.assertEqual(len(counts), 1)
+        self.assertEqual(
+            response.context['page_obj'].paginator.count,
+            COUNT_POSTS_FOR_TEST_TO_CREATE,
+        )
+        _, counts = self.count_queries(url)
+        self.assertEqual(counts, [])
+        Post.objects.create(text='Ещё пост', author=self.user,
+                            group=self.group)
+        response, counts = self.count_queries(url)
+        self.assertEqual(len(counts), 1)
+        self.assertEqual(
+            response.context['page_obj'].paginator.count,
+            COUNT_POSTS_FOR_TEST_TO_CREATE + 1,
+        )
+
+    def test_profile_count_comes_from_author_stats(self):
+        call_command('rebuild_author_stats', stdout=StringIO())
+        url = reverse('posts:profile', args=(self.user.username,))
+        response, counts = self.count_queries(url)
+        self.assertEqual(counts, [])
+        self.assertEqual(
+            response.context['page_obj'].paginator.count,
+            COUNT_POSTS_FOR_TEST_TO_CREATE,
+        )
+
+    @override_settings(POSTS_COUNT_ESTIMATE_FROM=10)
+    def test_index_uses_estimate_for_large_tables(self):
+        with mock.patch('posts.stats.estimated_count', return_value=10**6):
+            response = self.client.get(reverse('posts:index_page'))
+        page = response.context['page_obj']
+        self.assertEqual(page.paginator.count, 10**6)
+        self.assertIn(page.paginator.ELLIPSIS, page.elided_page_range)
+        self.assertContains(response, '…')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class UserExportTest(BaseTest):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=self.user,
+            group=self.group,
+            image=SimpleUploadedFile('export.gif', b'GIF89a' + b'0' * 100),
+        )
+        Comment.objects.create(post=self.post, author=self.user, text='Мой')
+        Post.objects.create(text='Чужой пост', author=self.author)
+
+    def test_zip_contains_content_and_images(self):
+        """Архив собирается потоком и содержит данные и картинки."""
+        response = self.client.get(reverse('posts:user_export'))
+        self.assertTrue(response.streaming)
+        self.assertIn('yatube-auth.zip', response['Content-Disposition'])
+        archive = zipfile.ZipFile(BytesIO(b''.join(response)))
+        posts = [json.loads(line) for line in
+                 archive.read('posts.ndjson').splitlines()]
+        self.assertEqual([post['text'] for post in posts],
+                         ['Пост с картинкой'])
+        self.assertEqual(posts[0]['group'], self.group.slug)
+        self.assertIn('Мой', archive.read('comments.ndjson').decode())
+        self.assertEqual(json.loads(archive.read('follows.ndjson')),
+                         {'author': 'author'})
+        self.assertEqual(
+            archive.read(f'images/{self.post.image.name}'),
+            self.post.image.open().read(),
+        )
+
+    def test_ndjson(self):
+        response = self.client.get(
+            reverse('posts:user_export'), {'format': 'ndjson'}
+        )
+        records = [json.loads(line) for line in
+                   b''.join(response).decode().splitlines()]
+        self.assertEqual([record['type'] for record in records],
+                         ['post', 'comment', 'follow'])
+
+    def test_export_requires_login(self):
+        response = Client().get(reverse('posts:user_export'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+
+class TrendingTest(BaseTest):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.quiet, cls.discussed = (
+            Post.objects.create(text=f'Пост {i}', author=cls.user)
+            for i in range(2)
+        )
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def comment(self, post, count=1):
+        for _ in range(count):
+            Comment.objects.create(post=post, author=self.reader, text='Ого')
+
+    def test_signals_update_scores(self):
+        """Комментарий и подписка на автора поднимают рейтинг поста."""
+        self.comment(self.quiet, 2)
+        # Первый вес успевает немного затухнуть до второго.
+        self.assertAlmostEqual(
+            TrendingScore.objects.get(post=self.quiet).score,
+            2 * settings.TRENDING_COMMENT_WEIGHT, places=3,
+        )
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.assertEqual(
+            TrendingScore.objects.get(post=self.discussed).score,
+            settings.TRENDING_FOLLOW_WEIGHT,
+        )
+
+    def test_trending_page_orders_by_score(self):
+        self.comment(self.quiet)
+        self.comment(self.discussed, 3)
+        url = reverse('posts:trending')
+        response = self.client.get(url)
+        self.assertEqual(
+            list(response.context['page_obj']), [self.discussed, self.quiet]
+        )
+        self.assertTrue(response.context['trending'])
+        self.assertContains(response, f'href="{url}"')
+        cache.clear()
+        # Число постов из кэша, список - один запрос с JOIN по рейтингу.
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+    def test_deleted_post_changes_trending_etag(self):
+        post = Post.objects.create(text='Удалят', author=self.user)
+        self.comment(post)
+        url = reverse('posts:trending')
+        etag = self.client.get(url)['ETag']
+        post.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertNotIn(post.text, response.content.decode())
+
+    def test_decay_halves_and_prunes_scores(self):
+        self.comment(self.quiet)
+        self.comment(self.discussed, 2)
+        call_command('decay_trending', stdout=StringIO())
+        now = trending.timezone.now() + settings.TRENDING_HALF_LIFE
+        with mock.patch.object(trending.timezone, 'now', lambda: now):
+            trending.decay()
+        self.assertAlmostEqual(
+            TrendingScore.objects.get(post=self.discussed).score,
+            settings.TRENDING_COMMENT_WEIGHT, places=3,
+        )
+        now += settings.TRENDING_HALF_LIFE * 10
+        with mock.patch.object(trending.timezone, 'now', lambda: now):
+            trending.decay()
+        self.assertFalse(TrendingScore.objects.exists())
+
+    def test_scores_decay_from_their_own_time(self):
+        """Вес, добавленный перед запуском, не затухает за весь период."""
+        weight = settings.TRENDING_COMMENT_WEIGHT
+        self.comment(self.quiet)
+        self.comment(self.discussed)
+        cache.clear()
+        now = trending.timezone.now() + settings.TRENDING_HALF_LIFE
+        with mock.patch.object(trending.timezone, 'now', lambda: now):
+            self.comment(self.discussed)
+            trending.decay()
+        self.assertAlmostEqual(
+            TrendingScore.objects.get(post=self.quiet).score,
+            weight / 2, places=3,
+        )
+        self.assertAlmostEqual(
+            TrendingScore.objects.get(post=self.discussed).score,
+            weight / 2 + weight, places=3,
+        )
+
+    def test_rebuild_from_comments(self):
+        self.comment(self.discussed, 2)
+        TrendingScore.objects.all().delete()
+        call_command('decay_trending', '--rebuild', stdout=StringIO())
+        self.assertAlmostEqual(
+            TrendingScore.objects.get(post=self.discussed).score,
+            2 * settings.TRENDING_COMMENT_WEIGHT, places=3,
+        )
+
+
+class GroupIndexTest(BaseTest):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.other_group = Group.objects.create(
+            title='Другая группа', slug='other-slug', description='Другая',
+        )
+        cls.empty_group = Group.objects.create(
+            title='Пустая группа', slug='empty-slug', description='Пусто',
+        )
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin',
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+        cache.clear()
+
+    def assertStats(self, group, posts_count, last_post):
+        group.refresh_from_db()
+        self.assertEqual(group.posts_count, posts_count)
+        self.assertEqual(
+            group.last_post_at, last_post.pub_date if last_post else None
+        )
+
+    def test_signals_keep_stats(self):
+        """Создание, перенос и удаление поста обновляют статистику групп."""
+        old = Post.objects.create(text='Старый', author=self.user,
+                                  group=self.group)
+        new = Post.objects.create(text='Новый', author=self.user,
+                                  group=self.group)
+        self.assertStats(self.group, 2, new)
+        self.author_client.post(
+            reverse('posts:post_edit', args=(new.pk,)),
+            {'text': new.text, 'group': self.other_group.pk},
+        )
+        self.assertStats(self.group, 1, old)
+        self.assertStats(self.other_group, 1, new)
+        old.delete()
+        self.assertStats(self.group, 0, None)
+
+    def test_admin_list_editable_moves_post(self):
+        post = Post.objects.create(text='Пост', author=self.user,
+                                   group=self.group)
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('admin:posts_post_changelist'), {
+            'form-TOTAL_FORMS': 1,
+            'form-INITIAL_FORMS': 1,
+            'form-0-id': post.pk,
+            'form-0-group': self.other_group.pk,
+            '_save': 'Сохранить',
+        })
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertStats(self.group, 0, None)
+        self.assertStats(self.other_group, 1, post)
+
+    def test_index_lists_groups_in_one_query(self):
+        Post.objects.create(text='Пост', author=self.user,
+                            group=self.other_group)
+        url = reverse('posts:group_index')
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(
+            list(response.context['group_list']),
+            [self.other_group, self.empty_group, self.group],
+        )
+        self.assertContains(response, 'Постов: 1')
+        self.assertContains(
+            response, reverse('posts:group_list', args=(self.group.slug,))
+        )
+
+    def test_refresh_group_stats(self):
+        post = Post.objects.create(text='Пост', author=self.user,
+                                   group=self.group)
+        Group.objects.update(posts_count=5, last_post_at=None)
+        stats.refresh_group_stats()
+        self.assertStats(self.group, 1, post)
+        self.assertStats(self.empty_group, 0, None)
+
+
+class CachedUrlTest(TestCase):
+    def setUp(self):
+        post_links._reverse.cache_clear()
+
+    def test_matches_reverse_and_hits_cache(self):
+        url = post_links.cached_reverse('posts:profile', 'auth')
+        self.assertEqual(url, reverse('posts:profile', args=('auth',)))
+        post_links.cached_reverse('posts:profile', 'auth')
+        self.assertEqual(post_links._reverse.cache_info().hits, 1)
+
+    def test_cleared_on_urlconf_change(self):
+        post_links.cached_reverse('posts:profile', 'auth')
+        with override_settings(ROOT_URLCONF='yatube.urls'):
+            self.assertEqual(post_links._reverse.cache_info().currsize, 0)
@@ -0,0 +1,134 @@
+"""Фоновая генерация миниатюр картинок постов.
+
+Шаблоны никогда не обрабатывают картинки сами: тег post_thumbnail только
+ищет готовую миниатюру в хранилище ключей sorl-thumbnail, а недостающие
+ставит в очередь пула потоков. Пока миниатюры нет, выводится оригинал.
+Вместе с основной миниатюрой создаются варианты ширин
+IMAGE_VARIANT_WIDTHS для srcset, не шире исходной картинки.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image
+from sorl.thumbnail import base, default
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import cache
+
+logger = logging.getLogger(__name__)
+
+WIDTH, HEIGHT = 960, 339
+GEOMETRY = f'{WIDTH}x{HEIGHT}'
+OPTIONS = {'crop': 'center', 'upscale': True}
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+class ThumbnailBackend(base.ThumbnailBackend):
+    def get_cached_thumbnail(self, file_, geometry_string, **options):
+        """Возвращает готовую миниатюру или None, ничего не генерируя."""
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+def get_cached_thumbnail(image):
+    if not image:
+        return None
+    return default.backend.get_cached_thumbnail(image, GEOMETRY, **OPTIONS)
+
+
+def variant_geometry(width):
+    return f'{width}x{round(width * HEIGHT / WIDTH)}'
+
+
+def get_cached_variants(image):
+    """Готовые варианты миниатюры как пары (миниатюра, ширина)."""
+    if not image:
+        return []
+    variants = []
+    for width in settings.IMAGE_VARIANT_WIDTHS:
+        thumbnail = default.backend.get_cached_thumbnail(
+            image, variant_geometry(width), **OPTIONS
+        )
+        if thumbnail is not None:
+            variants.append((thumbnail, width))
+    return variants
+
+
+def variant_widths(image_name):
+    with default_storage.open(image_name) as file:
+        source_width = Image.open(file).size[0]
+    return [width for width in settings.IMAGE_VARIANT_WIDTHS
+            if width != WIDTH and width <= source_width]
+
+
+def generate_thumbnail(image_name, post_id=None):
+    try:
+        default.backend.get_thumbnail(image_name, GEOMETRY, **OPTIONS)
+        for width in variant_widths(image_name):
+            default.backend.get_thumbnail(
+                image_name, variant_geometry(width), **OPTIONS
+            )
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', image_name)
+        return
+    finally:
+        with _lock:
+            _pending.discard(image_name)
+    if post_id is not None:
+        cache.bump(cache.post_scope(post_id))
+
+
+def _run_in_background(image_name, post_id):
+    try:
+        generate_thumbnail(image_name, post_id)
+    finally:
+        connections.close_all()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def _submit(image_name, post_id):
+    with _lock:
+        if image_name in _pending:
+            return
+        _pending.add(image_name)
+    _get_executor().submit(_run_in_background, image_name, post_id)
+
+
+def schedule_thumbnail(image, post_id=None):
+    """Ставит генерацию миниатюры в очередь после коммита транзакции."""
+    if not image:
+        return
+    image_name = image.name
+    if settings.THUMBNAIL_ASYNC:
+        job = lambda: _submit(image_name, post_id)  # noqa: E731
+    else:
+        job = lambda: generate_thumbnail(image_name, post_id)  # noqa: E731
+    transaction.on_commit(job)
@@ -0,0 +1,227 @@
+"""Потоковые выгрузка и загрузка контента (export_content, import_content).
+
+Каждая сущность пишется в свой файл <name>.jsonl или <name>.csv в порядке
+первичного ключа. Ключи сохраняются, поэтому авторы (с флагами
+администратора и временем входа), группы, подписки, комментарии и ссылки
+на картинки переносятся как есть; сами файлы
+картинок лежат в MEDIA_ROOT и копируются отдельно. Выборка идёт через
+iterator() (в PostgreSQL - курсор на стороне сервера), загрузка - пачками
+bulk_create, так что память не зависит от размера таблиц. После каждой
+пачки прогресс пишется в файл состояния, и прерванная команда с --resume
+продолжает с того же места.
+"""
+import csv
+import json
+import os
+from contextlib import contextmanager
+from datetime import date
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.db import connection
+
+from . import cache, feed
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+FORMATS = ('jsonl', 'csv')
+EXPORT_STATE = 'export-state.json'
+IMPORT_STATE = 'import-state.json'
+# Порядок загрузки: строки ссылаются только на уже загруженные.
+ENTITIES = (
+    # Права администраторов переносятся флагами is_staff и is_superuser;
+    # группы и отдельные права django.contrib.auth не выгружаются.
+    ('users', User, ('id', 'username', 'first_name', 'last_name', 'email',
+                     'password', 'is_active', 'is_staff', 'is_superuser',
+                     'last_login', 'date_joined')),
+    ('groups', Group, ('id', 'title', 'slug', 'description')),
+    ('posts', Post, ('id', 'text', 'author_id', 'group_id', 'image',
+                     'pub_date', 'updated_at')),
+    ('comments', Comment, ('id', 'post_id', 'author_id', 'text',
+                           'pub_date', 'updated_at')),
+    ('follows', Follow, ('id', 'user_id', 'author_id')),
+)
+
+
+def dump_path(directory, name, file_format):
+    return os.path.join(directory, f'{name}.{file_format}')
+
+
+def read_state(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def write_state(path, state):
+    # Через временный файл: прерывание не оставит состояние битым.
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(state, file)
+    os.replace(temporary, path)
+
+
+def _encode(value):
+    # Полная точность дат: от неё зависит порядок постов после загрузки.
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _row_writer(file, file_format, fields):
+    if file_format == 'csv':
+        writer = csv.writer(file)
+        return lambda row: writer.writerow(
+            '' if value is None else _encode(value) for value in row
+        )
+    return lambda row: file.write(json.dumps(
+        dict(zip(fields, row)), ensure_ascii=False, default=_encode
+    ) + '\n')
+
+
+def export_entity(directory, name, model, fields, file_format, state,
+                  state_path, chunk_size):
+    """Дописывает в файл сущности строки после сохранённого прогресса."""
+    path = dump_path(directory, name, file_format)
+    progress = state.get(name)
+    resume = progress is not None and os.path.exists(path)
+    if resume:
+        # Отрезаем строки, записанные после последнего сохранения.
+        os.truncate(path, progress['size'])
+    else:
+        progress = {'last_pk': None, 'size': 0, 'rows': 0}
+    rows = model.objects.order_by('pk')
+    if progress['last_pk'] is not None:
+        rows = rows.filter(pk__gt=progress['last_pk'])
+    rows = rows.values_list(*fields).iterator(chunk_size=chunk_size)
+    with open(path, 'a' if resume else 'w', encoding='utf-8',
+              newline='') as file:
+        write = _row_writer(file, file_format, fields)
+        if not resume and file_format == 'csv':
+            csv.writer(file).writerow(fields)
+        batch = ()
+        while True:
+            file.flush()
+            progress = {
+                'last_pk': batch[-1][0] if batch else progress['last_pk'],
+                'size': file.tell(),
+                'rows': progress['rows'] + len(batch),
+            }
+            state[name] = progress
+            write_state(state_path, state)
+            batch = list(islice(rows, chunk_size))
+            if not batch:
+                break
+            for row in batch:
+                write(row)
+    return progress['rows']
+
+
+def read_rows(path, file_format):
+    with open(path, encoding='utf-8', newline='') as file:
+        if file_format == 'csv':
+            reader = csv.reader(file)
+            header = next(reader, None)
+            for values in reader:
+                yield dict(zip(header, values))
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def build_object(model, fields, row):
+    values = {}
+    for attname, value in row.items():
+        field = fields[attname]
+        # В CSV NULL записан пустой строкой.
+        if value == '' and field.null:
+            value = None
+        values[attname] = field.to_python(value)
+    return model(**values)
+
+
+@contextmanager
+def preserved_dates(model):
+    """Отключает auto_now и auto_now_add: даты берутся из выгрузки."""
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def invalidated_scopes(name, batch):
+    """Области кэша, которые сигналы сбросили бы для этих строк."""
+    if name == 'posts':
+        scopes = {cache.POSTS_SCOPE}
+        for post in batch:
+            scopes.add(cache.profile_scope(post.author_id))
+            if post.group_id is not None:
+                scopes.add(cache.group_scope(post.group_id))
+        return scopes
+    if name == 'comments':
+        return {cache.post_scope(comment.post_id) for comment in batch}
+    if name == 'follows':
+        return {cache.follow_scope(follow.user_id) for follow in batch}
+    return set()
+
+
+def import_entity(directory, name, model, file_format, state, state_path,
+                  batch_size):
+    """Загружает файл сущности пачками, пропуская уже загруженные строки.
+
+    bulk_create не шлёт сигналов, поэтому производные таблицы
+    пересчитываются после загрузки, а кэш сбрасывается здесь же.
+    Строки с уже существующим ключом пропускаются.
+    """
+    path = dump_path(directory, name, file_format)
+    if not os.path.exists(path):
+        return 0
+    done = state.get(name, 0)
+    rows = islice(read_rows(path, file_format), done, None)
+    fields = {field.attname: field for field in model._meta.concrete_fields}
+    with preserved_dates(model):
+        while True:
+            batch = [
+                build_object(model, fields, row)
+                for row in islice(rows, batch_size)
+            ]
+            if not batch:
+                break
+            # Размер SQL-пачки выбирает бэкенд: у SQLite свои лимиты.
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+            cache.bump(*invalidated_scopes(name, batch))
+            done += len(batch)
+            state[name] = done
+            write_state(state_path, state)
+    return done
+
+
+def reset_sequences():
+    """После вставки с явными ключами сдвигает последовательности."""
+    statements = connection.ops.sequence_reset_sql(
+        no_style(), [model for _, model, _ in ENTITIES]
+    )
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def backfill_feeds():
+    """Раскладывает в ленты посты авторов по всем подпискам."""
+    follows = Follow.objects.only('user_id', 'author_id').iterator()
+    for follow in follows:
+        feed.backfill_feed(follow)
@@ -0,0 +1,101 @@
+"""Рейтинг популярных постов с экспоненциальным затуханием.
+
+Сигналы прибавляют вес к TrendingScore поста: TRENDING_COMMENT_WEIGHT за
+новый комментарий и TRENDING_FOLLOW_WEIGHT за нового подписчика автора
+(его получает последний пост автора за TRENDING_WINDOW). Каждая строка
+хранит момент decayed_at, к которому приведён её рейтинг, и затухает от
+него: множитель 0.5 ** (прошедшее время / TRENDING_HALF_LIFE). Новый вес
+прибавляется к рейтингу, уже приведённому к текущему моменту. Команда
+decay_trending раз в период приводит все строки и удаляет те, что ниже
+TRENDING_MIN_SCORE, поэтому таблица остаётся маленькой, а вкладка читает
+её по индексу score без агрегатов по комментариям.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import cache
+from .models import Comment, Post, TrendingScore
+
+
+def add_score(post_id, weight):
+    """Приводит рейтинг поста к текущему моменту и прибавляет вес."""
+    now = timezone.now()
+    with transaction.atomic():
+        score, created = (
+            TrendingScore.objects.select_for_update().get_or_create(
+                post_id=post_id,
+                defaults={'score': weight, 'decayed_at': now},
+            )
+        )
+        if not created:
+            score.score = score.score * decay_since(score, now) + weight
+            score.decayed_at = now
+            score.save(update_fields=['score', 'decayed_at'])
+    cache.bump(cache.TRENDING_SCOPE)
+
+
+def credit_follow(author_id):
+    post_id = (
+        Post.objects.filter(
+            author_id=author_id,
+            pub_date__gte=timezone.now() - settings.TRENDING_WINDOW,
+        ).values_list('pk', flat=True).first()
+    )
+    if post_id is not None:
+        add_score(post_id, settings.TRENDING_FOLLOW_WEIGHT)
+
+
+def decay_factor(elapsed):
+    return 0.5 ** (elapsed / settings.TRENDING_HALF_LIFE)
+
+
+def decay_since(score, now):
+    return decay_factor(max(now - score.decayed_at, timedelta(0)))
+
+
+def decay(now=None):
+    """Приводит каждый рейтинг к now от его собственного decayed_at.
+
+    Вес, добавленный незадолго до запуска, затухает только за прошедшие
+    с тех пор секунды. Возвращает (приведено строк, удалено строк).
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        scores = list(TrendingScore.objects.select_for_update())
+        for score in scores:
+            score.score *= decay_since(score, now)
+            score.decayed_at = now
+        TrendingScore.objects.bulk_update(scores, ['score', 'decayed_at'])
+        deleted, _ = TrendingScore.objects.filter(
+            score__lt=settings.TRENDING_MIN_SCORE
+        ).delete()
+    cache.bump(cache.TRENDING_SCOPE)
+    return len(scores), deleted
+
+
+def rebuild(now=None):
+    """Пересчитывает рейтинги по комментариям окна TRENDING_WINDOW.
+
+    Дат подписок в базе нет, поэтому их вклад при пересчёте теряется.
+    """
+    now = now or timezone.now()
+    scores = {}
+    comments = Comment.objects.filter(
+        pub_date__gte=now - settings.TRENDING_WINDOW
+    ).values_list('post_id', 'pub_date')
+    for post_id, pub_date in comments.iterator():
+        scores[post_id] = scores.get(post_id, 0) + (
+            settings.TRENDING_COMMENT_WEIGHT * decay_factor(now - pub_date)
+        )
+    with transaction.atomic():
+        TrendingScore.objects.all().delete()
+        TrendingScore.objects.bulk_create(
+            TrendingScore(post_id=post_id, score=score, decayed_at=now)
+            for post_id, score in scores.items()
+            if score >= settings.TRENDING_MIN_SCORE
+        )
+    cache.bump(cache.TRENDING_SCOPE)
+    return len(scores)
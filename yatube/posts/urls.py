@@ -1,17 +1,21 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 app_name = 'posts'
 
 
 urlpatterns = [
+    path('group/', views.GroupIndexView.as_view(),
+         name='group_index'),
     path('group/<slug:slug>/', views.GroupPostsView.as_view(),
          name='group_list'),
     path('profile/<str:username>/', views.ProfileView.as_view(),
          name='profile'),
     path('posts/<int:pk>/', views.PostDetailView.as_view(),
          name='post_detail'),
+    path('posts/<int:pk>/comments/', views.PostCommentsView.as_view(),
+         name='post_comments'),
     path('create/', views.PostCreateView.as_view(),
          name='post_create'),
     path('posts/<int:pk>/edit/', views.PostEditView.as_view(),
@@ -24,6 +28,24 @@ urlpatterns = [
          name='profile_follow'),
     path('profile/<str:username>/unfollow/', views.UnFollowAuthor.as_view(),
          name='profile_unfollow'),
+    path('export/', views.UserExportView.as_view(),
+         name='user_export'),
+    path('trending/', views.TrendingView.as_view(),
+         name='trending'),
+    path('search/', views.SearchView.as_view(),
+         name='search'),
+    path('search/api/', views.SearchApiView.as_view(),
+         name='search_api'),
+    path('api/v1/posts/', api.PostListApiView.as_view(),
+         name='api_index'),
+    path('api/v1/posts/<int:pk>/', api.PostDetailApiView.as_view(),
+         name='api_post_detail'),
+    path('api/v1/group/<slug:slug>/', api.GroupPostsApiView.as_view(),
+         name='api_group_list'),
+    path('api/v1/profile/<str:username>/', api.ProfileApiView.as_view(),
+         name='api_profile'),
+    path('api/v1/follow/', api.FollowingApiView.as_view(),
+         name='api_follow_index'),
     path('', (views.Index.as_view()),
          name='index_page'),
 ]
@@ -1,18 +1,193 @@
+import hashlib
+from http import HTTPStatus
+
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.shortcuts import get_object_or_404, redirect
+from django.db.models import F
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse, reverse_lazy
-from django.views.generic import CreateView, ListView, UpdateView
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.generic import (
+    CreateView, ListView, TemplateView, UpdateView,
+)
 from django.views.generic.base import View
 from django.views.generic.detail import DetailView
 from django.views.generic.edit import FormMixin
 
-from .models import Group, Follow, Post, User, Comment
+from core.pagination import CountedPaginator, CursorPaginator, InvalidCursor
+from . import cache, search, stats, user_export
+from .feed import get_feed
+from .models import (
+    AuthorStats, Comment, Follow, Group, Post, TrendingScore, User,
+)
 
 from .forms import CommentForm, PostForm
 
 
-class Index(ListView):
+class CursorPaginationMixin:
+    """Включает keyset-пагинацию по (pub_date, id) вместо OFFSET.
+
+    Режим задаётся настройкой POSTS_PAGINATION_MODE; запрос с параметром
+    cursor всегда обслуживается курсором.
+    """
+    cursor_kwarg = 'cursor'
+    pagination_mode = settings.POSTS_PAGINATION_MODE
+
+    def paginate_queryset(self, queryset, page_size):
+        cursor = self.request.GET.get(self.cursor_kwarg)
+        if self.pagination_mode != 'cursor' and cursor is None:
+            return super().paginate_queryset(queryset, page_size)
+        paginator = CursorPaginator(queryset, page_size)
+        try:
+            page = paginator.page(cursor)
+        except InvalidCursor as e:
+            raise Http404(str(e))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+class PageCacheMixin:
+    """Передаёт в шаблон версионированные ключи кэша страницы и постов.
+
+    Ключ страницы строится из версий областей get_cache_scopes() и постов
+    страницы, ключ поста - из версий самого поста и его автора; версии
+    увеличивают сигналы. По версиям областей кэшируется число постов для
+    пагинатора. Версии постов страницы входят и в валидаторы условного GET:
+    готовая миниатюра или новое имя автора меняют ETag.
+    """
+    paginator_class = CountedPaginator
+    _paginated = None
+    _post_versions = None
+
+    def get_cache_scopes(self):
+        return (cache.POSTS_SCOPE,)
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        return super().get_paginator(
+            queryset, per_page,
+            count_func=lambda: self.get_posts_count(queryset),
+            **kwargs,
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        # Страницу читают и валидаторы, и шаблон: запрос постов один.
+        if self._paginated is None:
+            self._paginated = super().paginate_queryset(queryset, page_size)
+        return self._paginated
+
+    def get_post_versions(self):
+        """Версии областей постов текущей страницы и их авторов."""
+        if self._post_versions is None:
+            queryset = self.get_queryset()
+            page = self.paginate_queryset(
+                queryset, self.get_paginate_by(queryset)
+            )[1]
+            self._post_versions = cache.get_versions({
+                scope for post in page for scope in (
+                    cache.post_scope(post.pk),
+                    cache.author_scope(post.author_id),
+                )
+            })
+        return self._post_versions
+
+    def get_validator_versions(self):
+        return {**super().get_validator_versions(),
+                **self.get_post_versions()}
+
+    def get_posts_count(self, queryset):
+        versions = cache.get_versions(self.get_cache_scopes())
+        return cache.cached_count(versions, queryset.count)
+
+    def get_page_cache_key(self, versions, page):
+        post_versions = hashlib.md5(
+            repr(sorted(self.get_post_versions().items())).encode()
+        ).hexdigest()
+        return ':'.join(
+            [f'{scope}={versions[scope]}' for scope in self.get_cache_scopes()]
+            + [str(page.number), post_versions]
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        page = context['page_obj']
+        versions = {**cache.get_versions(self.get_cache_scopes()),
+                    **self.get_post_versions()}
+        for post in page:
+            post.cache_version = max(
+                versions[cache.post_scope(post.pk)],
+                versions[cache.author_scope(post.author_id)],
+            )
+        context['cache_seconds'] = settings.CACHE_PAGE_SECONDS
+        context['fragment_cache_seconds'] = settings.CACHE_FRAGMENT_SECONDS
+        context['page_cache_key'] = self.get_page_cache_key(versions, page)
+        return context
+
+
+class ConditionalGetMixin:
+    """Отвечает 304 Not Modified, пока страница не менялась.
+
+    ETag и Last-Modified считаются из версий областей кэша, пользователя
+    и адреса страницы, так что ответ 304 обходится без рендера шаблонов.
+    """
+
+    def get_validator_scopes(self):
+        return self.get_cache_scopes()
+
+    def get_validator_versions(self):
+        return cache.get_versions(self.get_validator_scopes())
+
+    def get_etag_parts(self):
+        return []
+
+    def get_csrf_etag_part(self):
+        """Секрет CSRF для страниц с формами POST.
+
+        После входа токен меняется (rotate_token), и страница из кэша
+        браузера с прежним {% csrf_token %} получила бы 403 на отправке.
+        Анониму формы не показываются, и cookie CSRF ему не заводится.
+        """
+        if not self.request.user.is_authenticated:
+            return ''
+        # get_token заводит секрет уже на первом запросе, иначе ETag
+        # следующего запроса, пришедшего с cookie, не совпал бы.
+        get_token(self.request)
+        return self.request.META['CSRF_COOKIE']
+
+    def get_last_modified(self, versions):
+        return cache.last_modified(versions)
+
+    def get_etag(self, versions):
+        user = self.request.user
+        parts = [
+            self.request.get_full_path(),
+            f'user={user.pk if user.is_authenticated else 0}',
+            *(f'{scope}={version}' for scope, version
+              in sorted(versions.items())),
+            *map(str, self.get_etag_parts()),
+        ]
+        return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+    def get(self, request, *args, **kwargs):
+        versions = self.get_validator_versions()
+        etag = quote_etag(self.get_etag(versions))
+        last_modified = int(self.get_last_modified(versions).timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        # Без no-cache браузер может показать страницу из кэша
+        # по эвристике Last-Modified, не спросив сервер.
+        patch_cache_control(response, no_cache=True)
+        return response
+
+
+class Index(PageCacheMixin, ConditionalGetMixin, CursorPaginationMixin,
+            ListView):
     paginate_by = settings.COUNT_OF_POSTS_PAGINATOR
     model = Post
     template_name = 'posts/index.html'
@@ -20,14 +195,62 @@ class Index(ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data()
         context['index'] = True
-        context['cache_seconds'] = settings.CACHE_PAGE_SECONDS
         return context
 
     def get_queryset(self):
         return Post.objects.select_related('author', 'group')
 
+    def get_posts_count(self, queryset):
+        threshold = settings.POSTS_COUNT_ESTIMATE_FROM
+        if threshold is not None:
+            estimate = stats.estimated_count(Post)
+            if estimate is not None and estimate >= threshold:
+                return estimate
+        return super().get_posts_count(queryset)
+
+
+class TrendingView(PageCacheMixin, ConditionalGetMixin, ListView):
+    """Популярные посты: один индексный проход по TrendingScore."""
+    paginate_by = settings.COUNT_OF_POSTS_PAGINATOR
+    model = Post
+    template_name = 'posts/index.html'
+
+    def get_cache_scopes(self):
+        return (cache.TRENDING_SCOPE,)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data()
+        context['trending'] = True
+        return context
+
+    def get_queryset(self):
+        return (
+            Post.objects.filter(trending__isnull=False)
+            .select_related('author', 'group')
+            .order_by('-trending__score', '-pk')
+        )
+
+    def get_posts_count(self, queryset):
+        versions = cache.get_versions(self.get_cache_scopes())
+        return cache.cached_count(versions, TrendingScore.objects.count)
+
+
+class GroupIndexView(ConditionalGetMixin, ListView):
+    """Каталог групп: статистика берётся из колонок Group одним запросом."""
+    model = Group
+    template_name = 'posts/group_index.html'
 
-class GroupPostsView(ListView):
+    def get_cache_scopes(self):
+        return (cache.GROUPS_SCOPE,)
+
+    def get_queryset(self):
+        return Group.objects.order_by(
+            F('last_post_at').desc(nulls_last=True), 'title'
+        )
+
+
+class GroupPostsView(PageCacheMixin, ConditionalGetMixin,
+                     CursorPaginationMixin, ListView):
     paginate_by = settings.COUNT_OF_POSTS_PAGINATOR
     model = Post
     template_name = 'posts/group_list.html'
@@ -35,29 +258,65 @@ class GroupPostsView(ListView):
     def get_group_instance(self):
         return get_object_or_404(Group, slug=self.kwargs.get('slug'))
 
+    def get(self, request, *args, **kwargs):
+        self.group = self.get_group_instance()
+        return super().get(request, *args, **kwargs)
+
+    def get_cache_scopes(self):
+        return (cache.group_scope(self.group.pk),)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data()
-        group = self.get_group_instance()
-        context['group'] = group
+        context['group'] = self.group
         return context
 
     def get_queryset(self):
-        return (Post.objects.select_related('author')
-                .filter(group__slug=self.kwargs.get('slug')))
+        return Post.objects.select_related('author').filter(group=self.group)
 
 
-class ProfileView(ListView):
+class ProfileView(PageCacheMixin, ConditionalGetMixin, CursorPaginationMixin,
+                  ListView):
     paginate_by = settings.COUNT_OF_POSTS_PAGINATOR
     model = Post
     template_name = 'posts/profile.html'
 
+    def get(self, request, *args, **kwargs):
+        self.author = get_object_or_404(
+            User.objects.select_related('stats'),
+            username=self.kwargs.get('username'),
+        )
+        return super().get(request, *args, **kwargs)
+
+    def get_cache_scopes(self):
+        return (cache.profile_scope(self.author.pk),)
+
+    def get_validator_scopes(self):
+        scopes = (*self.get_cache_scopes(), cache.author_scope(self.author.pk))
+        if self.request.user.is_authenticated:
+            scopes += (cache.follow_scope(self.request.user.pk),)
+        return scopes
+
+    def get_etag_parts(self):
+        parts = [self.get_csrf_etag_part()]
+        # Счётчики подписчиков меняются без версии профиля.
+        author_stats = getattr(self.author, 'stats', None)
+        if author_stats is not None:
+            parts += [author_stats.posts_count, author_stats.followers_count,
+                      author_stats.following_count]
+        return parts
+
+    def get_posts_count(self, queryset):
+        author_stats = getattr(self.author, 'stats', None)
+        if author_stats is None:
+            return super().get_posts_count(queryset)
+        return author_stats.posts_count
+
     def get_queryset(self):
-        return (Post.objects.select_related('group')
-                .filter(author__username=self.kwargs.get('username')))
+        return Post.objects.select_related('group').filter(author=self.author)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data()
-        author = get_object_or_404(User, username=self.kwargs.get('username'))
+        author = self.author
         context['author'] = author
         context['following'] = (
             self.request.user.is_authenticated
@@ -66,21 +325,86 @@ class ProfileView(ListView):
         return context
 
 
-class PostDetailView(DetailView, FormMixin):
+class CommentsPageMixin:
+    """Страница комментариев поста по курсору от новых к старым.
+
+    Ключ (pub_date, id) читается по индексу (post, -pub_date), автор
+    подтягивается тем же запросом.
+    """
+    comments_cursor_kwarg = 'comments_cursor'
+
+    def get_comments_page(self, post_id):
+        comments = Comment.objects.filter(post_id=post_id).select_related(
+            'author'
+        )
+        paginator = CursorPaginator(
+            comments, settings.COUNT_OF_COMMENTS_PAGINATOR
+        )
+        try:
+            return paginator.page(
+                self.request.GET.get(self.comments_cursor_kwarg)
+            )
+        except InvalidCursor as e:
+            raise Http404(str(e))
+
+    def get_comments_context(self, post_id):
+        scope = cache.post_scope(post_id)
+        return {
+            'comments': self.get_comments_page(post_id),
+            'comments_post_id': post_id,
+            'comments_cache_version': cache.get_versions([scope])[scope],
+            'fragment_cache_seconds': settings.CACHE_FRAGMENT_SECONDS,
+        }
+
+
+class PostDetailView(ConditionalGetMixin, CommentsPageMixin, DetailView,
+                     FormMixin):
     model = Post
     template_name = 'posts/post_detail.html'
     form_class = CommentForm
 
+    def get_object(self, queryset=None):
+        if getattr(self, 'object', None) is None:
+            self.object = super().get_object(queryset)
+        return self.object
+
+    def get_validator_scopes(self):
+        post = self.get_object()
+        return (cache.post_scope(post.pk), cache.author_scope(post.author_id))
+
+    def get_etag_parts(self):
+        post = self.get_object()
+        author_stats = getattr(post.author, 'stats', None)
+        return [post.updated_at.isoformat(),
+                author_stats.posts_count if author_stats else 0,
+                self.get_csrf_etag_part()]
+
+    def get_last_modified(self, versions):
+        return max(super().get_last_modified(versions),
+                   self.get_object().updated_at)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data()
-        post = get_object_or_404(Post, pk=self.object.pk)
-        comments = post.comments.all()
-        context['comments'] = comments
+        context.update(self.get_comments_context(self.object.pk))
         return context
 
     def get_queryset(self):
-        return (Post.objects.select_related('author').all()
-                .select_related('group').all())
+        return Post.objects.select_related('author__stats', 'group')
+
+
+class PostCommentsView(ConditionalGetMixin, CommentsPageMixin,
+                       TemplateView):
+    """Следующие страницы комментариев фрагментом для подгрузки."""
+    template_name = 'posts/includes/comments_page.html'
+
+    def get_validator_scopes(self):
+        return (cache.post_scope(self.kwargs['pk']),)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(self.get_comments_context(self.kwargs['pk']))
+        context['comments_fragment'] = True
+        return context
 
 
 class PostCreateView(LoginRequiredMixin, CreateView):
@@ -128,7 +452,17 @@ class PostEditView(LoginRequiredMixin, UpdateView):
         return reverse_lazy('posts:post_detail', args=(self.object.pk,))
 
 
+def is_ajax(request):
+    """Запрос из скрипта страницы: ему нужен фрагмент или JSON."""
+    return request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+
+
 class AddCommentView(LoginRequiredMixin, CreateView):
+    """Добавляет комментарий.
+
+    Форма без скрипта получает редирект на пост, а запрос из скрипта -
+    только отрисованный комментарий, без повторного рендера страницы.
+    """
     model = Comment
     form_class = CommentForm
 
@@ -138,49 +472,157 @@ class AddCommentView(LoginRequiredMixin, CreateView):
         new_comment.post = post
         new_comment.author = self.request.user
         new_comment.save()
+        if is_ajax(self.request):
+            return render(self.request, 'posts/includes/comment.html',
+                          {'comment': new_comment}, status=HTTPStatus.CREATED)
         return redirect(reverse('posts:post_detail', args=(post.pk,)))
 
+    def form_invalid(self, form):
+        if is_ajax(self.request):
+            return JsonResponse({'errors': form.errors},
+                                status=HTTPStatus.BAD_REQUEST)
+        return super().form_invalid(form)
+
 
-class FollowingListView(LoginRequiredMixin, ListView):
+class FollowingListView(LoginRequiredMixin, PageCacheMixin,
+                        ConditionalGetMixin, ListView):
     paginate_by = settings.COUNT_OF_POSTS_PAGINATOR
     model = Post
     template_name = 'posts/index.html'
 
+    def get_cache_scopes(self):
+        return (cache.POSTS_SCOPE, cache.follow_scope(self.request.user.pk))
+
+    def get_page_cache_key(self, versions, page):
+        key = super().get_page_cache_key(versions, page)
+        return f'{self.request.user.pk}:{key}'
+
     def get_context_data(self):
         context = super().get_context_data()
         context['following_view'] = True
-        context['cache_seconds'] = settings.CACHE_PAGE_SECONDS
         return context
 
     def get_queryset(self):
-        return Post.objects.filter(author__following__user=self.request.user)
+        return get_feed(self.request.user).select_related('author', 'group')
 
 
-class FollowAuthor(LoginRequiredMixin, View):
-    model = User
-    template_name = 'posts/profile.html'
+def follow_author(user, author):
+    if author != user:
+        Follow.objects.get_or_create(author=author, user=user)
 
-    def get(self, *args, **kwargs):
-        author = get_object_or_404(User, username=self.kwargs.get('username'))
-        if author != self.request.user:
-            Follow.objects.get_or_create(author=author, user=self.request.user)
-        return redirect(reverse(
-            'posts:profile',
-            args=(self.kwargs.get('username'),)
-        ))
 
+def unfollow_author(user, author):
+    Follow.objects.filter(user=user, author=author).delete()
 
-class UnFollowAuthor(LoginRequiredMixin, View):
-    model = User
-    template_name = 'posts/profile.html'
 
-    def get(self, *args, **kwargs):
-        author = get_object_or_404(User, username=self.kwargs.get('username'))
-        is_follower = Follow.objects.filter(
-            user=self.request.user,
-            author=author,
+class FollowActionMixin:
+    """Подписка и отписка по GET со ссылки или по POST из формы.
+
+    Запрос из скрипта получает JSON с новым состоянием подписки и
+    счётчиками автора вместо редиректа на профиль.
+    """
+
+    def get(self, request, *args, **kwargs):
+        # Старые ссылки на подписку по GET продолжают работать.
+        return self.post(request, *args, **kwargs)
+
+    def follow_response(self, author):
+        if not is_ajax(self.request):
+            return redirect(reverse('posts:profile', args=(author.username,)))
+        counters = (
+            AuthorStats.objects.filter(user=author)
+            .values('followers_count', 'following_count').first()
+        ) or {'followers_count': 0, 'following_count': 0}
+        return JsonResponse({
+            'following': Follow.objects.filter(
+                user=self.request.user, author=author
+            ).exists(),
+            **counters,
+        })
+
+    def get_author(self):
+        return get_object_or_404(User, username=self.kwargs.get('username'))
+
+
+class FollowAuthor(LoginRequiredMixin, FollowActionMixin, View):
+    def post(self, request, *args, **kwargs):
+        author = self.get_author()
+        follow_author(request.user, author)
+        return self.follow_response(author)
+
+
+class UnFollowAuthor(LoginRequiredMixin, FollowActionMixin, View):
+    def post(self, request, *args, **kwargs):
+        author = self.get_author()
+        unfollow_author(request.user, author)
+        return self.follow_response(author)
+
+
+class UserExportView(LoginRequiredMixin, View):
+    """Потоковая выгрузка постов, комментариев и подписок пользователя."""
+
+    def get(self, request, *args, **kwargs):
+        file_format = request.GET.get('format', 'zip')
+        if file_format not in user_export.FORMATS:
+            raise Http404('Неизвестный формат выгрузки')
+        stream = (user_export.stream_zip if file_format == 'zip'
+                  else user_export.stream_ndjson)
+        response = StreamingHttpResponse(
+            stream(request.user),
+            content_type=user_export.CONTENT_TYPES[file_format],
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename="'
+            f'{user_export.filename(request.user, file_format)}"'
         )
-        is_follower.delete()
-        return redirect(
-            reverse('posts:profile', args=(self.kwargs.get('username'),))
+        return response
+
+
+class SearchView(PageCacheMixin, ListView):
+    paginate_by = settings.COUNT_OF_POSTS_PAGINATOR
+    template_name = 'posts/search.html'
+
+    def get_search_query(self):
+        return self.request.GET.get('q', '').strip()
+
+    def get_queryset(self):
+        return search.search_post_ids(self.get_search_query())
+
+    def get_posts_count(self, queryset):
+        return len(queryset)
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page, post_ids, is_paginated = (
+            super().paginate_queryset(queryset, page_size)
         )
+        page.object_list = search.load_posts(post_ids)
+        return paginator, page, page.object_list, is_paginated
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.get_search_query()
+        return context
+
+
+class SearchApiView(SearchView):
+    def render_to_response(self, context, **response_kwargs):
+        page = context['page_obj']
+        return JsonResponse({
+            'query': context['query'],
+            'count': page.paginator.count,
+            'page': page.number,
+            'next': page.next_page_number() if page.has_next() else None,
+            'previous': (page.previous_page_number()
+                         if page.has_previous() else None),
+            'results': [
+                {
+                    'id': post.pk,
+                    'text': post.text,
+                    'author': post.author.username,
+                    'group': post.group.slug if post.group else None,
+                    'pub_date': post.pub_date.isoformat(),
+                    'url': reverse('posts:post_detail', args=(post.pk,)),
+                }
+                for post in page
+            ],
+        })
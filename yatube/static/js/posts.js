@@ -0,0 +1,138 @@
+// Подписка, комментарии и подгрузка старых комментариев без перезагрузки
+// страницы. Без скрипта формы и ссылки работают как обычно.
+(function () {
+  'use strict';
+
+  function send(form) {
+    return fetch(form.action, {
+      method: 'POST',
+      body: new FormData(form),
+      credentials: 'same-origin',
+      headers: {'X-Requested-With': 'XMLHttpRequest'},
+    });
+  }
+
+  function fallback(form, response) {
+    // Сессия истекла или сервер ответил не так: обычная отправка формы.
+    if (response.redirected) {
+      window.location.assign(response.url);
+    } else {
+      form.submit();
+    }
+  }
+
+  function enhanceFollow(form) {
+    form.addEventListener('submit', function (event) {
+      event.preventDefault();
+      send(form).then(function (response) {
+        if (!response.ok || response.redirected) {
+          return fallback(form, response);
+        }
+        return response.json().then(function (data) {
+          var button = form.querySelector('button');
+          form.action = data.following ?
+            form.dataset.unfollowUrl : form.dataset.followUrl;
+          button.textContent = data.following ? 'Отписаться' : 'Подписаться';
+          button.classList.toggle('btn-light', data.following);
+          button.classList.toggle('btn-primary', !data.following);
+          document.querySelectorAll('[data-followers-count]').forEach(
+            function (node) { node.textContent = data.followers_count; }
+          );
+          document.querySelectorAll('[data-following-count]').forEach(
+            function (node) { node.textContent = data.following_count; }
+          );
+        });
+      });
+    });
+  }
+
+  function clearErrors(form) {
+    form.querySelectorAll('[data-field-error]').forEach(function (node) {
+      node.remove();
+    });
+    form.querySelectorAll('.is-invalid').forEach(function (field) {
+      field.classList.remove('is-invalid');
+    });
+  }
+
+  function showErrors(form, errors) {
+    // Ошибки формы из JSON ответа 400 - под полями, как при обычной
+    // отправке; общие ошибки - под кнопкой.
+    Object.keys(errors).forEach(function (name) {
+      var field = form.elements[name];
+      var anchor = field || form.querySelector('button[type="submit"]');
+      if (field) {
+        field.classList.add('is-invalid');
+      }
+      errors[name].forEach(function (message) {
+        var node = document.createElement('div');
+        node.className = 'invalid-feedback d-block';
+        node.setAttribute('data-field-error', '');
+        node.textContent = message;
+        anchor.insertAdjacentElement('afterend', node);
+      });
+    });
+  }
+
+  var COMMENT_FAILED = 'Не удалось отправить комментарий. Обновите ' +
+    'страницу, прежде чем отправлять его снова: он мог сохраниться.';
+
+  function enhanceComment(form) {
+    var list = document.querySelector(form.dataset.comments);
+    form.addEventListener('submit', function (event) {
+      event.preventDefault();
+      clearErrors(form);
+      send(form).then(function (response) {
+        if (response.status === 201 && !response.redirected) {
+          return response.text().then(function (html) {
+            list.insertAdjacentHTML('afterbegin', html);
+            form.reset();
+          });
+        }
+        if (response.status === 400) {
+          return response.json().then(function (data) {
+            showErrors(form, data.errors || {});
+          }, function () {
+            showErrors(form, {__all__: [COMMENT_FAILED]});
+          });
+        }
+        if (response.status >= 400) {
+          // Повторная отправка после 5xx задвоила бы уже сохранённый
+          // комментарий, поэтому только сообщаем об ошибке.
+          return showErrors(form, {__all__: [COMMENT_FAILED]});
+        }
+        return fallback(form, response);
+      }, function () {
+        // Сеть недоступна: пробуем обычную отправку формы.
+        form.submit();
+      });
+    });
+  }
+
+  function loadMoreComments(event) {
+    var link = event.target.closest('[data-comments-more]');
+    if (!link) {
+      return;
+    }
+    event.preventDefault();
+    var nav = link.closest('[data-comments-nav]');
+    fetch(link.dataset.commentsMore, {credentials: 'same-origin'})
+      .then(function (response) {
+        if (!response.ok) {
+          window.location.assign(link.href);
+          return;
+        }
+        return response.text().then(function (html) {
+          nav.insertAdjacentHTML('afterend', html);
+          nav.remove();
+        });
+      });
+  }
+
+  document.addEventListener('click', loadMoreComments);
+
+  document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('[data-follow-form]').forEach(enhanceFollow);
+    document.querySelectorAll('[data-comment-form]').forEach(enhanceComment);
+  });
+})();
@@ -11,6 +11,8 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
+from datetime import timedelta
 
 from dotenv import load_dotenv
 import sentry_sdk
@@ -65,6 +67,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.profiling.ProfilingMiddleware',
+    'core.replicas.ReplicaStickinessMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -72,17 +76,26 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.ratelimit.RateLimitMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Скомпилированные шаблоны живут в памяти процесса и не читаются
+            # с диска на каждый include; в DEBUG правки видны сразу.
+            'loaders': TEMPLATE_LOADERS if DEBUG else [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -108,8 +121,44 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT'),
+        # Пул соединений процесса (core/db/pool.py)
+        'POOL': {
+            'ENABLED': os.getenv('DB_POOL', 'True') == 'True',
+            'MIN_SIZE': int(os.getenv('DB_POOL_MIN_SIZE', 1)),
+            'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            'TIMEOUT': 5,
+            'MAX_LIFETIME': 30 * 60,
+            'PRE_PING': True,
+        },
     }
 }
+# Стандартные движки подменяются пулящими обёртками из core.db.backends
+POOLED_ENGINES = {
+    'django.db.backends.postgresql': 'core.db.backends.postgresql',
+    'django.db.backends.sqlite3': 'core.db.backends.sqlite3',
+}
+DATABASES['default']['ENGINE'] = POOLED_ENGINES.get(
+    DATABASES['default']['ENGINE'], DATABASES['default']['ENGINE']
+)
+
+# Реплики только для чтения (core/replicas.py): DB_REPLICAS - хосты
+# через запятую, для SQLite - пути к файлам копий базы.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1
+):
+    alias = f'replica{number}'
+    DATABASES[alias] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    if DATABASES[alias]['ENGINE'].endswith('sqlite3'):
+        DATABASES[alias]['NAME'] = replica
+    else:
+        host, _, port = replica.partition(':')
+        DATABASES[alias]['HOST'] = host
+        DATABASES[alias]['PORT'] = port or DATABASES['default']['PORT']
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['core.replicas.PrimaryReplicaRouter']
+# Сколько секунд после записи читать из основной БД
+DATABASE_STICKY_SECONDS = 10
 
 
 # Password validation
@@ -149,8 +198,15 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 
 STATIC_URL = '/static/'
-STATIC_ROOT = os.path.join(BASE_DIR, 'static')
-# STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+# Исходники статики лежат в static/, collectstatic собирает их с хешами
+# в именах и сжатыми копиями (core/storage.py) в STATIC_ROOT.
+STATIC_ROOT = os.getenv(
+    'STATIC_ROOT', os.path.join(BASE_DIR, 'collected_static')
+)
+STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+# Раздавать STATIC_ROOT из WSGI (core/static_server.py), если нет nginx
+STATIC_SERVE = os.getenv('STATIC_SERVE', 'False') == 'True'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
 LOGIN_URL = 'users:login'
@@ -159,14 +215,104 @@ LOGIN_REDIRECT_URL = 'posts:index_page'
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 COUNT_OF_POSTS_PAGINATOR = 10
+# 'offset' - нумерованные страницы, 'cursor' - keyset по (pub_date, id)
+POSTS_PAGINATION_MODE = os.getenv('POSTS_PAGINATION_MODE', 'offset')
+COUNT_OF_COMMENTS_PAGINATOR = 50
+# Главная берёт оценку reltuples PostgreSQL вместо COUNT(*), если постов
+# больше порога; None отключает оценку.
+POSTS_COUNT_ESTIMATE_FROM = 100000
 POST_TITLE_SHOW_LENGTH = 15
+# Лента подписок: авторы с большим числом подписчиков читаются без fan-out,
+# обратно на разнос их переводит backfill_feeds ниже нижнего порога
+FEED_FANOUT_MAX_FOLLOWERS = 1000
+FEED_FANOUT_MIN_FOLLOWERS = 800
+FEED_BACKFILL_SIZE = 1000
+# Сколько строк FeedEntry backfill_feeds пишет за один запуск
+FEED_BACKFILL_MAX_ROWS = 100000
+FEED_BATCH_SIZE = 500
+# Вкладка «Популярное» (posts/trending.py): веса событий и затухание
+TRENDING_COMMENT_WEIGHT = 1.0
+TRENDING_FOLLOW_WEIGHT = 3.0
+TRENDING_HALF_LIFE = timedelta(hours=24)
+TRENDING_WINDOW = timedelta(days=7)
+TRENDING_MIN_SCORE = 0.05
+# Корзины токенов на пользователя и IP для пишущих маршрутов
+# (core/ratelimit.py); счётчики живут в кэше CACHES[RATE_LIMIT_CACHE].
+RATE_LIMITS = {
+    'posts:post_create': {'rate': '10/m'},
+    'posts:add_comment': {'rate': '20/m'},
+    'posts:profile_follow': {'rate': '60/m', 'methods': ('GET', 'POST')},
+    'posts:profile_unfollow': {'rate': '60/m', 'methods': ('GET', 'POST')},
+    'users:signup': {'rate': '5/h'},
+}
+# За прокси адрес клиента берётся из заголовка, например
+# RATE_LIMIT_IP_META_KEY=HTTP_X_REAL_IP.
+RATE_LIMIT_IP_META_KEY = os.getenv('RATE_LIMIT_IP_META_KEY', 'REMOTE_ADDR')
+# Строк в пачке выгрузки и загрузки export_content/import_content
+TRANSFER_BATCH_SIZE = 1000
+# Сколько адресов помнит тег {% cached_url %} в каждом процессе
+TEMPLATE_URL_CACHE_SIZE = 10000
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+# Общий для всех воркеров кэш: фрагменты инвалидируются сигналами
+# через версии ключей (posts/cache.py), поэтому хранилище должно быть
+# одним на все процессы.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache',
+        ),
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            os.path.join(tempfile.gettempdir(), 'yatube_cache'),
+        ),
+    }
+}
+# У файлового и locmem-кэша по умолчанию 300 ключей: фрагменты постов
+# быстро их выбирают, и каждая запись стирает треть случайных ключей,
+# включая версии областей. Лимит с запасом, чистка - по десятой части.
+# Файловый кэш при каждой записи пересчитывает файлы каталога, так что
+# на больших объёмах нужен Memcached или Redis.
+if CACHES['default']['BACKEND'] in (
+    'django.core.cache.backends.filebased.FileBasedCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+):
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 100000)),
+        'CULL_FREQUENCY': 10,
     }
+# Корзины лимитов (core/ratelimit.py) - в отдельном кэше с атомарным incr.
+# В продакшене это общий для воркеров Memcached или Redis, например
+# RATE_LIMIT_CACHE_BACKEND=django.core.cache.backends.memcached.PyLibMCCache;
+# LocMemCache по умолчанию считает лимиты в каждом процессе отдельно,
+# и без DEBUG manage.py check предупреждает об этом (core.W001).
+RATE_LIMIT_CACHE = 'ratelimit'
+CACHES[RATE_LIMIT_CACHE] = {
+    'BACKEND': os.getenv(
+        'RATE_LIMIT_CACHE_BACKEND',
+        'django.core.cache.backends.locmem.LocMemCache',
+    ),
+    'LOCATION': os.getenv('RATE_LIMIT_CACHE_LOCATION', 'ratelimit'),
 }
 SECONDS_IN_MINUTE = 60
 CACHE_PAGE_MINUTES = SECONDS_IN_MINUTE * 20
 CACHE_PAGE_SECONDS = 20
+CACHE_FRAGMENT_SECONDS = CACHE_PAGE_MINUTES
+
+# Миниатюры создаются в фоне (posts/thumbnails.py), шаблоны их только ищут
+THUMBNAIL_BACKEND = 'posts.thumbnails.ThumbnailBackend'
+THUMBNAIL_ASYNC = True
+THUMBNAIL_WORKERS = 2
+# Загрузки картинок (posts/images.py) и адаптивные ширины миниатюр
+IMAGE_MAX_SIDE = 2048
+IMAGE_QUALITY = 82
+IMAGE_VARIANT_WIDTHS = (480, 960, 1440)
+
+# Полнотекстовый поиск (posts/search.py)
+SEARCH_CONFIG = 'russian'
+SEARCH_MAX_RESULTS = 1000
+
+# Выборочное профилирование запросов (core/profiling.py)
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0.01'))
+PROFILING_BUFFER_SIZE = 1000